@@ -1,10 +1,11 @@
 import streamlit as st
 import preprocessor
 import helper
-import matplotlib.pyplot as plt
-import seaborn as sns
+import cache
+import profiling
+import summary
+import sketches
 import warnings
-import pandas as pd
 warnings.filterwarnings('ignore')
 
 # Page configuration
@@ -49,6 +50,10 @@ st.markdown("""
 # Initialize session state
 if 'df' not in st.session_state:
     st.session_state.df = None
+    st.session_state.index = None
+    st.session_state.chat_key = None
+    st.session_state.upload_key = None
+    st.session_state.analyzed = False
 
 st.sidebar.title("📱 WhatsApp Chat Analyzer")
 st.sidebar.markdown("---")
@@ -56,37 +61,79 @@ st.sidebar.markdown("---")
 # File uploader with instructions
 st.sidebar.markdown("### 📤 Upload WhatsApp Chat")
 uploaded_file = st.sidebar.file_uploader(
-    "Choose a .txt file",
-    type=['txt'],
-    help="Export your WhatsApp chat without media and upload the .txt file"
+    "Choose a .txt or .zip file",
+    type=['txt', 'zip'],
+    help="Export your WhatsApp chat without media and upload the .txt file or the .zip WhatsApp produces"
 )
+low_memory = st.sidebar.checkbox(
+    "💾 Low-memory mode",
+    help="Stream the chat in chunks and keep only the aggregates, for exports larger than this server's memory"
+)
+approximate = st.sidebar.checkbox(
+    "≈ Approximate mode",
+    help="Estimate word, emoji and distinct counts with sketches whose size does not grow with the chat"
+)
+error = None
+if approximate:
+    error = st.sidebar.select_slider(
+        "Error bound",
+        options=[0.0001, 0.0005, 0.001, 0.005, 0.01],
+        value=sketches.DEFAULT_ERROR,
+        format_func=lambda bound: f"{bound:.2%}",
+        help="Word and emoji counts may overestimate by up to this share of all words"
+    )
+progressive = st.sidebar.checkbox(
+    "⚡ Progressive rendering",
+    value=True,
+    help="Show statistics and timelines first; the heatmap, users, words, emojis and exports are computed when their tab is opened"
+)
+st.sidebar.checkbox(
+    "📈 Interactive charts",
+    key='native_charts',
+    help="Draw charts in the browser, with zoom and tooltips, instead of as matplotlib images; faster for long chats"
+)
+performance = st.sidebar.checkbox(
+    "⏱️ Performance panel",
+    help="Show the wall time, rows and peak allocation of every parsing, analysis and chart stage of this run"
+)
+record_profile = performance and st.sidebar.checkbox(
+    "🔬 Record a cProfile of this run",
+    help="Profile the next run and offer the .prof file (open it with snakeviz, or convert it with flameprof)"
+)
+
+# Stages of this run are recorded for the Performance panel; a run cut short by st.stop() is closed here
+if st.session_state.get('perf_run') is not None:
+    st.session_state.perf_run.finish()
+st.session_state.perf_run = profiling.start_run(memory=performance, profile=record_profile)
 
 if uploaded_file is not None:
     try:
-        # Read and decode file
-        bytes_data = uploaded_file.getvalue()
-
-        # Try different encodings
-        encodings = ['utf-8', 'utf-8-sig', 'utf-16', 'latin-1']
-        data = None
-
-        for encoding in encodings:
-            try:
-                data = bytes_data.decode(encoding)
-                break
-            except UnicodeDecodeError:
-                continue
-
-        if data is None:
-            st.error("Unable to decode the file. Please ensure it's a valid WhatsApp chat export.")
-            st.stop()
-
-        # Preprocess data
-        with st.spinner("Processing chat data..."):
-            df = preprocessor.preprocess(data)
-            if df is not None and not df.empty:
+        # Preprocess data, streaming and decoding the upload chunk by chunk
+        with st.spinner("Processing chat data..."), profiling.stage('load'):
+            # Reruns and re-uploads of the same export are served from the memory and disk caches
+            # The upload is hashed once; reruns with the same file reuse its key
+            if st.session_state.upload_key is None or st.session_state.upload_key[0] != uploaded_file.file_id:
+                st.session_state.upload_key = (uploaded_file.file_id, cache.chat_key(uploaded_file))
+            key = st.session_state.upload_key[1]
+            if low_memory or approximate:
+                # Chunks are folded into mergeable aggregates and discarded; no DataFrame is kept
+                df = None
+                index = cache.memory.get_or_compute(
+                    ('summary', key, error), lambda: summary.summarize(uploaded_file, key=key, error=error))
+                attrs = index.attrs if index is not None else {}
+            else:
+                df = cache.cached_preprocess(uploaded_file, workers=preprocessor.PARSE_WORKERS, compact=True, key=key)
+                # Per-user row positions shared by every helper call and every session
+                index = helper.chat_index(df, key) if df is not None and not df.empty else None
+                attrs = df.attrs if index is not None else {}
+            if index is not None:
+                if key != st.session_state.chat_key:
+                    st.session_state.chat_key = key
+                    st.session_state.analyzed = False
                 st.session_state.df = df
+                st.session_state.index = index
                 st.sidebar.success("✅ Data loaded successfully!")
+                st.sidebar.caption(f"🧭 Detected format: {attrs.get('chat_format_label', 'Unknown')}")
             else:
                 st.error("No valid messages found in the chat file.")
                 st.stop()
@@ -95,16 +142,20 @@ if uploaded_file is not None:
         st.error(f"Error processing file: {str(e)}")
         st.stop()
 
-# User selection
-if st.session_state.df is not None:
-    df = st.session_state.df
+    if st.sidebar.button("🗑️ Clear Cached Chats", help="Forget every parsed chat stored on this server"):
+        cache.clear()
+        st.sidebar.info("Cache cleared.")
 
-    # Fetch unique users
-    user_list = df['user'].unique().tolist()
+    stats = cache.memory.stats()
+    st.sidebar.caption(f"🧠 Result cache: {stats['hits']:,} hits / {stats['misses']:,} misses, "
+                       f"{stats['bytes'] / 1024 ** 2:.1f} of {stats['max_bytes'] / 1024 ** 2:.0f} MB")
 
-    # Remove system messages
-    system_messages = ['group_notification', 'Notification', 'notification', 'System']
-    user_list = [user for user in user_list if user not in system_messages]
+# User selection
+if st.session_state.index is not None:
+    index = st.session_state.index
+
+    # Fetch unique users, excluding system messages
+    user_list = list(index.participants)
 
     if len(user_list) == 0:
         st.error("No valid users found in the chat.")
@@ -121,268 +172,89 @@ if st.session_state.df is not None:
 
     st.sidebar.markdown("---")
 
-    # Analysis button
+    # Analysis button; results stay on screen across reruns until a new chat is uploaded
     if st.sidebar.button("🚀 Analyze Chat"):
+        st.session_state.analyzed = True
+
+    if st.session_state.analyzed:
+        # Sections are only imported once there is something to plot
+        import sections
 
         # Main header
         st.markdown(f"<h1 class='main-header'>📊 Chat Analysis: {selected_user}</h1>", unsafe_allow_html=True)
 
-        # Top Statistics
-        st.markdown("## 📈 Top Statistics")
-        num_messages, words, num_media_messages, num_links = helper.fetch_stats(selected_user, df)
+        # Every section reads from one report; sections are computed when first shown
+        report = helper.analyze(index, selected_user, lazy=True)
 
-        col1, col2, col3, col4 = st.columns(4)
+        # Placeholders keep the page layout; the sections are filled in below as their data is ready
+        slots = {}
 
-        with col1:
-            st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-            st.metric("📨 Total Messages", f"{num_messages:,}")
-            st.markdown('</div>', unsafe_allow_html=True)
-
-        with col2:
-            st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-            st.metric("💬 Total Words", f"{words:,}")
-            st.markdown('</div>', unsafe_allow_html=True)
-
-        with col3:
-            st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-            st.metric("🖼️ Media Shared", f"{num_media_messages:,}")
-            st.markdown('</div>', unsafe_allow_html=True)
-
-        with col4:
-            st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-            st.metric("🔗 Links Shared", f"{num_links:,}")
-            st.markdown('</div>', unsafe_allow_html=True)
+        # Top Statistics
+        st.markdown("## 📈 Top Statistics")
+        slots[sections.render_stats] = st.empty()
 
         # Timeline Analysis
         st.markdown("---")
         st.markdown("## 📅 Timeline Analysis")
-
-        col1, col2 = st.columns(2)
-
-        with col1:
-            st.markdown("### Monthly Timeline")
-            timeline = helper.monthly_timeline(selected_user, df)
-            if not timeline.empty:
-                fig, ax = plt.subplots(figsize=(10, 6))
-                ax.plot(timeline['time'], timeline['message'], color='#25D366', linewidth=2.5, marker='o')
-                ax.fill_between(timeline['time'], timeline['message'], alpha=0.3, color='#25D366')
-                ax.set_xlabel('Month-Year', fontsize=12)
-                ax.set_ylabel('Number of Messages', fontsize=12)
-                ax.set_title('Monthly Activity Trend', fontsize=14, fontweight='bold')
-                plt.xticks(rotation=45, ha='right')
-                plt.grid(True, alpha=0.3)
-                st.pyplot(fig)
-                plt.close()
-
-        with col2:
-            st.markdown("### Daily Timeline")
-            daily_timeline = helper.daily_timeline(selected_user, df)
-            if not daily_timeline.empty:
-                fig, ax = plt.subplots(figsize=(10, 6))
-                ax.plot(daily_timeline['only_date'], daily_timeline['message'],
-                       color='#128C7E', linewidth=2)
-                ax.set_xlabel('Date', fontsize=12)
-                ax.set_ylabel('Number of Messages', fontsize=12)
-                ax.set_title('Daily Activity Trend', fontsize=14, fontweight='bold')
-                plt.xticks(rotation=45, ha='right')
-                plt.grid(True, alpha=0.3)
-                st.pyplot(fig)
-                plt.close()
+        slots[sections.render_timelines] = st.empty()
 
         # Activity Analysis
         st.markdown("---")
         st.markdown("## 🕒 Activity Analysis")
+        slots[sections.render_activity] = st.empty()
 
-        col1, col2 = st.columns(2)
-
-        with col1:
-            st.markdown("### Most Active Day")
-            busy_day = helper.week_activity_map(selected_user, df)
-            if not busy_day.empty:
-                fig, ax = plt.subplots(figsize=(10, 6))
-                colors = plt.cm.Set3(range(len(busy_day)))
-                ax.bar(busy_day.index, busy_day.values, color=colors)
-                ax.set_xlabel('Day of Week', fontsize=12)
-                ax.set_ylabel('Number of Messages', fontsize=12)
-                ax.set_title('Activity by Day', fontsize=14, fontweight='bold')
-                plt.xticks(rotation=45)
-                st.pyplot(fig)
-                plt.close()
-
-        with col2:
-            st.markdown("### Most Active Month")
-            busy_month = helper.month_activity_map(selected_user, df)
-            if not busy_month.empty:
-                fig, ax = plt.subplots(figsize=(10, 6))
-                colors = plt.cm.Paired(range(len(busy_month)))
-                ax.bar(busy_month.index, busy_month.values, color=colors)
-                ax.set_xlabel('Month', fontsize=12)
-                ax.set_ylabel('Number of Messages', fontsize=12)
-                ax.set_title('Activity by Month', fontsize=14, fontweight='bold')
-                plt.xticks(rotation=45)
-                st.pyplot(fig)
-                plt.close()
-
-        # Heatmap
-        st.markdown("### Weekly Activity Heatmap")
-        heatmap = helper.activity_heatmap(selected_user, df)
-        if not heatmap.empty:
-            fig, ax = plt.subplots(figsize=(12, 6))
-            sns.heatmap(heatmap, cmap='YlGnBu', linewidths=0.5, linecolor='gray',
-                       cbar_kws={'label': 'Number of Messages'})
-            ax.set_xlabel('Time Period (Hour)', fontsize=12)
-            ax.set_ylabel('Day of Week', fontsize=12)
-            ax.set_title('Activity Heatmap (Day vs Time)', fontsize=14, fontweight='bold')
-            st.pyplot(fig)
-            plt.close()
-
-        # User Analysis (Only for Overall)
-        if selected_user == "Overall":
+        if progressive:
+            # Expensive sections are computed and drawn only when their tab is opened
             st.markdown("---")
-            st.markdown("## 👥 User Analysis")
-
-            x, new_df = helper.most_busy_users(df)
+            st.markdown("## 🔍 Detailed Analysis" + (" (approximate)" if report.approximate else ""))
+            details = st.empty()
 
-            col1, col2 = st.columns([3, 2])
-
-            with col1:
-                st.markdown("### Most Active Users")
-                fig, ax = plt.subplots(figsize=(10, 6))
-                colors = plt.cm.viridis(range(len(x)))
-                bars = ax.bar(x.index, x.values, color=colors)
-                ax.set_xlabel('Users', fontsize=12)
-                ax.set_ylabel('Number of Messages', fontsize=12)
-                ax.set_title('Top Contributors', fontsize=14, fontweight='bold')
-                plt.xticks(rotation=45, ha='right')
-
-                # Add value labels on bars
-                for bar in bars:
-                    height = bar.get_height()
-                    ax.text(bar.get_x() + bar.get_width()/2., height + 0.1,
-                           f'{int(height):,}', ha='center', va='bottom', fontsize=10)
-
-                st.pyplot(fig)
-                plt.close()
-
-            with col2:
-                st.markdown("### User Contribution")
-                st.dataframe(new_df, width='stretch')
+        else:
+            # Heatmap
+            st.markdown("### Weekly Activity Heatmap")
+            slots[sections.render_heatmap] = st.empty()
 
-        # Word Analysis
-        st.markdown("---")
-        st.markdown("## 📝 Word Analysis")
-
-        col1, col2 = st.columns(2)
-
-        with col1:
-            st.markdown("### Word Cloud")
-            try:
-                wc = helper.create_wordcloud(selected_user, df)
-                if wc:
-                    fig, ax = plt.subplots(figsize=(10, 6))
-                    ax.imshow(wc, interpolation='bilinear')
-                    ax.axis("off")
-                    ax.set_title('Frequent Words', fontsize=14, fontweight='bold')
-                    st.pyplot(fig)
-                    plt.close()
-            except Exception as e:
-                st.warning("Word cloud could not be generated.")
-
-        with col2:
-            st.markdown("### Most Common Words")
-            common_df = helper.most_common_words(selected_user, df)
-            if not common_df.empty:
-                fig, ax = plt.subplots(figsize=(10, 6))
-                colors = plt.cm.coolwarm(range(len(common_df)))
-                bars = ax.barh(common_df[0], common_df[1], color=colors)
-                ax.set_xlabel('Frequency', fontsize=12)
-                ax.set_ylabel('Words', fontsize=12)
-                ax.set_title('Top 20 Most Used Words', fontsize=14, fontweight='bold')
-                ax.invert_yaxis()
-
-                # Add value labels
-                for i, (value, bar) in enumerate(zip(common_df[1], bars)):
-                    ax.text(value + 0.1, bar.get_y() + bar.get_height()/2,
-                           f' {value}', va='center', fontsize=10)
-
-                st.pyplot(fig)
-                plt.close()
-
-        # Emoji Analysis
-        st.markdown("---")
-        st.markdown("## 😊 Emoji Analysis")
+            # User Analysis (Only for Overall)
+            if selected_user == "Overall":
+                st.markdown("---")
+                st.markdown("## 👥 User Analysis")
+                slots[sections.render_busy_users] = st.empty()
 
-        emoji_df = helper.emoji_helper(selected_user, df)
+            # Word Analysis
+            st.markdown("---")
+            st.markdown("## 📝 Word Analysis" + (" (approximate)" if report.approximate else ""))
 
-        if not emoji_df.empty:
-            col1, col2 = st.columns([2, 3])
+            col1, col2 = st.columns(2)
 
             with col1:
-                st.markdown("### Top Emojis")
-                st.dataframe(emoji_df.head(10), width='stretch')
+                slots[sections.render_wordcloud] = st.empty()
 
             with col2:
-                st.markdown("### Emoji Distribution")
-                fig, ax = plt.subplots(figsize=(8, 8))
-                # Fixed: Use column names instead of indices
-                if 'Count' in emoji_df.columns and 'Emoji' in emoji_df.columns:
-                    ax.pie(emoji_df['Count'].head(10), labels=emoji_df['Emoji'].head(10),
-                          autopct='%1.1f%%', startangle=90,
-                          colors=plt.cm.tab20c(range(len(emoji_df.head(10)))))
-                else:
-                    # Fallback to index-based access
-                    ax.pie(emoji_df.iloc[:, 1].head(10), labels=emoji_df.iloc[:, 0].head(10),
-                          autopct='%1.1f%%', startangle=90,
-                          colors=plt.cm.tab20c(range(len(emoji_df.head(10)))))
-                ax.set_title('Top 10 Emoji Usage', fontsize=14, fontweight='bold')
-                ax.axis('equal')
-                st.pyplot(fig)
-                plt.close()
-        else:
-            st.write("No emojis found in the chat.")
+                slots[sections.render_common_words] = st.empty()
 
-        # Download Section
-        st.markdown("---")
-        st.markdown("## 📥 Export Analysis")
-
-        col1, col2, col3 = st.columns(3)
-
-        with col1:
-            stats_df = pd.DataFrame({
-                'Metric': ['Total Messages', 'Total Words', 'Media Shared', 'Links Shared'],
-                'Value': [num_messages, words, num_media_messages, num_links]
-            })
-            st.download_button(
-                label="📊 Download Statistics CSV",
-                data=stats_df.to_csv(index=False),
-                file_name=f"chat_stats_{selected_user}.csv",
-                mime="text/csv"
-            )
-
-        with col2:
-            timeline_data = helper.monthly_timeline(selected_user, df)
-            st.download_button(
-                label="📅 Download Timeline CSV",
-                data=timeline_data.to_csv(index=False),
-                file_name=f"timeline_{selected_user}.csv",
-                mime="text/csv"
-            )
-
-        with col3:
-            if not emoji_df.empty:
-                st.download_button(
-                    label="😊 Download Emoji Data",
-                    data=emoji_df.to_csv(index=False),
-                    file_name=f"emoji_analysis_{selected_user}.csv",
-                    mime="text/csv"
-                )
+            # Emoji Analysis
+            st.markdown("---")
+            st.markdown("## 😊 Emoji Analysis" + (" (approximate)" if report.approximate else ""))
+            slots[sections.render_emojis] = st.empty()
+
+            # Download Section
+            st.markdown("---")
+            st.markdown("## 📥 Export Analysis")
+            slots[sections.render_export] = st.empty()
+
+        # Independent sections are computed concurrently and each is drawn as soon as it is ready
+        sections.render_concurrently(report, slots)
+        if progressive:
+            with details.container():
+                sections.render_details(report)
 
         # Footer
         st.markdown("---")
         st.markdown("""
         <div style='text-align: center; color: #666; font-size: 0.9rem;'>
         <p>Made with ❤️ using Streamlit | WhatsApp Chat Analyzer v2.0</p>
-        <p>Note: This tool analyzes chat data locally. No data is stored on any server.</p>
+        <p>Note: Chats are analyzed on the server running this app and kept in its memory until evicted or cleared.
+        They are only written to disk when the server enables its chat cache.</p>
         </div>
         """, unsafe_allow_html=True)
 
@@ -413,7 +285,7 @@ else:
        - Open any WhatsApp chat
        - Tap on three dots → More → Export chat
        - Choose "Without Media"
-       - You'll receive a `.txt` file
+       - You'll receive a `.txt` file (or a `.zip` containing it)
 
     2. **Upload the file** in the sidebar
 
@@ -423,6 +295,24 @@ else:
 
     ---
 
-    **⚠️ Privacy Note**: All processing happens locally in your browser.
-    Your chat data is never uploaded to any server.
-    """)
\ No newline at end of file
+    **⚠️ Privacy Note**: Your chat is uploaded to and analyzed on the server running this app, not in your browser.
+    Parsed chats and results stay in that server's memory, shared by its sessions, until evicted or cleared with
+    "🗑️ Clear Cached Chats". They are only written to disk if the server sets `WHATSAPP_ANALYZER_CACHE_DIR`.
+    """)
+# Performance panel: every stage this run executed (cached results run no stages)
+run = st.session_state.perf_run.finish()
+if performance:
+    with st.sidebar.expander("⏱️ Performance", expanded=True):
+        stages = run.table()
+        if stages.empty:
+            st.caption("No stages ran: every result came from the cache.")
+        else:
+            stages['stage'] = ['· ' * depth + name for name, depth in zip(stages['stage'], stages['depth'])]
+            st.dataframe(stages.drop(columns='depth'), hide_index=True, width='stretch',
+                         column_config={'seconds': st.column_config.NumberColumn(format="%.3f"),
+                                        'peak_mb': st.column_config.NumberColumn("peak MB", format="%.1f")})
+        st.caption(f"Run total: {run.seconds:.2f}s")
+        profile = run.profile_bytes()
+        if profile is not None:
+            st.download_button("🔬 Download cProfile (.prof)", data=profile,
+                               file_name="whatsapp_analyzer.prof", mime="application/octet-stream")
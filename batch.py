@@ -0,0 +1,231 @@
+"""
+Analyse many WhatsApp exports without the Streamlit UI
+
+    python batch.py exports/ "archive/**/*.zip" --output results --workers 4
+
+Each chat gets <name>.json with the Overall analysis and per-user stats
+(plus <name>.parquet with the parsed messages when --parquet is given, and
+<name>.prof, a cProfile dump, when --profile is given), and summary.json lists every input with its status.
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+import helper
+import preprocessor
+import profiling
+import summary
+
+EXPORT_EXTENSIONS = ('.txt', '.zip')
+
+# Report sections written to JSON (the word cloud is an image and is skipped)
+SECTIONS = ('stats', 'distinct', 'top_domains', 'monthly_timeline', 'daily_timeline',
+            'week_activity', 'month_activity', 'heatmap', 'busy_users', 'common_words', 'emojis')
+
+# most_common_words returns unnamed columns
+COLUMN_NAMES = {'common_words': ['word', 'count']}
+
+
+def find_exports(patterns):
+    """
+    Sorted export paths from directories, files and glob patterns
+    """
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            matches = glob.glob(pattern, recursive=True)
+        paths.update(os.path.abspath(path) for path in matches
+                     if os.path.isfile(path) and path.lower().endswith(EXPORT_EXTENSIONS))
+    return sorted(paths)
+
+
+def output_names(paths):
+    """
+    Unique output file stem for every export
+    """
+    names, seen = {}, {}
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        seen[stem] = seen.get(stem, 0) + 1
+        names[path] = stem if seen[stem] == 1 else f"{stem}-{seen[stem]}"
+    return names
+
+
+def to_json(value):
+    """
+    JSON-friendly form of a report section
+    """
+    if isinstance(value, pd.DataFrame):
+        if not isinstance(value.index, pd.RangeIndex):
+            value = value.reset_index()
+        return [{str(column): to_json(item) for column, item in row.items()}
+                for row in value.to_dict(orient='records')]
+    if isinstance(value, pd.Series):
+        return {str(label): to_json(item) for label, item in value.items()}
+    if isinstance(value, (tuple, list)):
+        return [to_json(item) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def named(section, value):
+    """
+    Section value with readable column names
+    """
+    if section in COLUMN_NAMES and isinstance(value, pd.DataFrame) and not value.empty:
+        return value.set_axis(COLUMN_NAMES[section], axis=1)
+    return value
+
+
+def analyze_file(path, output_dir, name, options):
+    """
+    Process pool entry point: analyse one export and write its results
+
+    Never raises; failures are reported in the returned record so one bad
+    export does not stop the batch.
+    """
+    started = time.perf_counter()
+    record = {'file': path, 'name': name, 'status': 'ok'}
+    run = profiling.start_run(profile=options['profile'])
+    try:
+        if options['low_memory'] or options['error'] is not None:
+            index = summary.summarize(path, error=options['error'])
+            if index is None:
+                raise ValueError("No valid messages found in the file")
+            chat_format = index.attrs.get('chat_format_label')
+            messages = index.stats('Overall')[0]
+        else:
+            df = preprocessor.preprocess(path, compact=True)
+            if df is None:
+                raise ValueError("No valid messages found in the file")
+            if options['parquet']:
+                df.to_parquet(os.path.join(output_dir, f"{name}.parquet"), index=False)
+            index = helper.ChatIndex(df)
+            chat_format = df.attrs.get('chat_format_label')
+            messages = len(df)
+
+        report = helper.analyze(index, 'Overall', lazy=True)
+        result = {
+            'file': path,
+            'format': chat_format,
+            'approximate': report.approximate,
+            'overall': {section: to_json(named(section, getattr(report, section))) for section in SECTIONS},
+            'users': {user: dict(zip(('messages', 'words', 'media', 'links'),
+                                     helper.fetch_stats(user, index)))
+                      for user in index.participants},
+        }
+        with open(os.path.join(output_dir, f"{name}.json"), 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+        record.update(messages=int(messages), users=len(index.participants), format=chat_format)
+
+    except Exception as e:
+        record.update(status='error', error=f"{type(e).__name__}: {e}", messages=0)
+
+    run.finish()
+    if options['profile']:
+        run.dump_profile(os.path.join(output_dir, f"{name}.prof"))
+    record['stages'] = {stage['stage']: round(stage['seconds'], 4) for stage in run.stages}
+
+    record['seconds'] = round(time.perf_counter() - started, 3)
+    return record
+
+
+def run(paths, output_dir, workers=1, options=None):
+    """
+    Analyse every export, printing progress, and return the per-file records
+    """
+    options = dict({'parquet': False, 'low_memory': False, 'error': None, 'profile': False}, **(options or {}))
+    os.makedirs(output_dir, exist_ok=True)
+    names = output_names(paths)
+    records = []
+
+    def report(record):
+        records.append(record)
+        detail = f"{record['messages']:,} messages in {record['seconds']:.1f}s" \
+            if record['status'] == 'ok' else record['error']
+        print(f"[{len(records)}/{len(paths)}] {record['name']}: {record['status']} - {detail}", flush=True)
+
+    if workers <= 1:
+        for path in paths:
+            report(analyze_file(path, output_dir, names[path], options))
+    else:
+        # Spawned workers start clean, like the parser's own pool
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = {pool.submit(analyze_file, path, output_dir, names[path], options): path
+                       for path in paths}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    record = future.result()
+                except Exception as e:
+                    # The worker itself died (e.g. out of memory)
+                    record = {'file': path, 'name': names[path], 'status': 'error',
+                              'error': f"{type(e).__name__}: {e}", 'messages': 0, 'seconds': 0.0}
+                report(record)
+
+    records.sort(key=lambda record: record['file'])
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse WhatsApp chat exports in bulk")
+    parser.add_argument('inputs', nargs='+',
+                        help="Export files, directories of exports, or glob patterns (quote them)")
+    parser.add_argument('-o', '--output', default='results', help="Directory for the results")
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1,
+                        help="Exports analysed in parallel")
+    parser.add_argument('--parquet', action='store_true',
+                        help="Also write the parsed messages of each chat as Parquet")
+    parser.add_argument('--low-memory', action='store_true',
+                        help="Stream each export and keep only aggregates (no Parquet output)")
+    parser.add_argument('--error', type=float, default=None,
+                        help="Approximate word/emoji counts with sketches at this error bound")
+    parser.add_argument('--profile', action='store_true',
+                        help="Write a cProfile dump of each chat's analysis as <name>.prof")
+    args = parser.parse_args(argv)
+
+    paths = find_exports(args.inputs)
+    if not paths:
+        print("No .txt or .zip exports found.", file=sys.stderr)
+        return 1
+
+    print(f"Analysing {len(paths)} exports with {args.workers} workers...", flush=True)
+    started = time.perf_counter()
+    records = run(paths, args.output, args.workers, {
+        'parquet': args.parquet, 'low_memory': args.low_memory, 'error': args.error,
+        'profile': args.profile})
+    elapsed = time.perf_counter() - started
+
+    failed = [record for record in records if record['status'] != 'ok']
+    messages = sum(record['messages'] for record in records)
+    totals = {
+        'exports': len(records),
+        'failed': len(failed),
+        'messages': messages,
+        'seconds': round(elapsed, 3),
+        'messages_per_second': round(messages / elapsed, 1) if elapsed else None,
+        'results': records,
+    }
+    with open(os.path.join(args.output, 'summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(totals, f, ensure_ascii=False, indent=2)
+
+    print(f"Done: {len(records) - len(failed)} ok, {len(failed)} failed, {messages:,} messages "
+          f"in {elapsed:.1f}s ({totals['messages_per_second']:,} messages/s)")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,10 @@
+"""
+Reproducible benchmarks for the parser and the analysis helpers
+
+    python -m benchmarks.run --sizes 10k,100k --baseline benchmarks/baseline.json
+    python -m benchmarks.imports --budget 1.0
+
+generator builds deterministic synthetic exports; run times each stage in a
+fresh process and compares the results against a stored baseline; imports
+checks the dashboard's cold-start import time against a budget.
+"""
@@ -0,0 +1,142 @@
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+# Shape of a synthetic chat; the same config always produces the same bytes
+ChatConfig = namedtuple('ChatConfig', [
+    'messages', 'users', 'multiline_ratio', 'emoji_density', 'url_density',
+    'media_density', 'system_ratio', 'platform', 'clock', 'seed'
+], defaults=[10_000, 20, 0.05, 0.3, 0.02, 0.05, 0.01, 'android', '24h', 0])
+
+# Header timestamp layouts, matching formats in preprocessor's registry
+STAMPS = {
+    ('android', '24h'): '%d/%m/%Y, %H:%M - ',
+    ('android', '12h'): '%d/%m/%y, %I:%M %p - ',
+    ('ios', '24h'): '[%d/%m/%Y, %H:%M:%S] ',
+    ('ios', '12h'): '[%d/%m/%y, %I:%M:%S %p] ',
+}
+
+MEDIA = {'android': '<Media omitted>', 'ios': 'image omitted'}
+ENCRYPTION_NOTICE = 'Messages and calls are end-to-end encrypted. No one outside of this chat can read them.'
+
+COMMON_WORDS = ('the and you hai kya nahi yes ok haan bhai yaar chalo kal aaj good morning '
+                'night thanks please what when where how why love sorry done sure').split()
+SYLLABLES = 'ka ra ma ta na sa la pa da ga ha ja ri mi ti ni si li pi di go ro mo to no so lo po do'.split()
+EMOJIS = ['😂', '❤️', '👍', '👍🏽', '🙏', '😍', '🔥', '😭', '🎉', '👨‍👩‍👧', '🇮🇳', '1️⃣', '😊', '🤣', '💯']
+DOMAINS = ['youtube.com', 'instagram.com', 'example.org', 'news.example.com', 'github.com', 'maps.google.com']
+FIRST_NAMES = ['Aarav', 'Priya', 'Rohit', 'Sneha', 'Alice', 'Bob', 'Chloé', 'Dev', 'Fatima', 'Kenji',
+               'Lucía', 'Mohammed', 'Nia', 'Omar', 'Ravi', 'Sara', 'Tomás', 'Wei', 'Yara', 'Zoe']
+
+# Messages generated per block
+BLOCK_SIZE = 100_000
+
+VOCABULARY_SIZE = 20_000
+
+
+def _vocabulary(rng):
+    """
+    Common words followed by shuffled pseudo-words, sampled with a Zipf distribution
+    """
+    lengths = rng.integers(2, 5, VOCABULARY_SIZE)
+    syllables = rng.integers(0, len(SYLLABLES), (VOCABULARY_SIZE, 4))
+    words = {''.join(SYLLABLES[s] for s in row[:length]) for row, length in zip(syllables, lengths)}
+    words = rng.permutation(sorted(words - set(COMMON_WORDS)))
+    return np.array(COMMON_WORDS + list(words), dtype=object)
+
+
+def _users(count):
+    """
+    Participant names: first names, numbered once they run out, and some phone numbers
+    """
+    users = []
+    for i in range(count):
+        if i % 7 == 6:
+            users.append(f"+91 98{i:03d} {10000 + i * 37 % 90000:05d}")
+        else:
+            name = FIRST_NAMES[i % len(FIRST_NAMES)]
+            users.append(name if i < len(FIRST_NAMES) else f"{name} {i // len(FIRST_NAMES) + 1}")
+    return np.array(users, dtype=object)
+
+
+def iter_chat(config=ChatConfig()):
+    """
+    Yield the text of a synthetic export in blocks of BLOCK_SIZE messages
+    """
+    if (config.platform, config.clock) not in STAMPS:
+        raise ValueError(f"Unsupported platform/clock: {config.platform} {config.clock}")
+
+    rng = np.random.default_rng(config.seed)
+    vocabulary = _vocabulary(rng)
+    users = _users(config.users)
+    # A few users send most of the messages
+    weights = 1 / np.arange(1, config.users + 1) ** 0.8
+    weights /= weights.sum()
+
+    if config.platform == 'ios':
+        yield f"{pd.Timestamp('2020-01-01').strftime(STAMPS['ios', config.clock])}{users[0]}: " \
+              f"‎{ENCRYPTION_NOTICE}\n"
+    else:
+        yield f"{pd.Timestamp('2020-01-01').strftime(STAMPS['android', config.clock])}{ENCRYPTION_NOTICE}\n"
+
+    minute = np.int64(pd.Timestamp('2020-01-01 08:00').value // 60_000_000_000)
+    for start in range(0, config.messages, BLOCK_SIZE):
+        n = min(BLOCK_SIZE, config.messages - start)
+
+        # Gaps of a few seconds to a few hours between messages
+        seconds = np.cumsum(rng.exponential(240, n).astype(np.int64) + 1) + minute * 60
+        minute = seconds[-1] // 60
+        stamps = pd.to_datetime(seconds, unit='s').strftime(STAMPS[config.platform, config.clock])
+        senders = users[rng.choice(config.users, n, p=weights)]
+
+        lengths = rng.integers(1, 16, n)
+        words = vocabulary[(rng.zipf(1.3, lengths.sum()) - 1) % len(vocabulary)]
+        ends = np.cumsum(lengths)
+        kind = rng.random(n)
+        emoji = rng.random(n) < config.emoji_density
+        emoji_picks = rng.integers(0, len(EMOJIS), n)
+        url = rng.random(n) < config.url_density
+        url_picks = rng.integers(0, len(DOMAINS), n)
+        multiline = rng.random(n) < config.multiline_ratio
+        split_at = rng.integers(1, 16, n)
+
+        lines = []
+        for i in range(n):
+            if kind[i] < config.system_ratio:
+                lines.append(f"{stamps[i]}{senders[i]} joined using this group's invite link"
+                             if config.platform == 'android' else
+                             f"{stamps[i]}{senders[i]}: ‎{senders[i]} joined using this group's invite link")
+                continue
+            if kind[i] < config.system_ratio + config.media_density:
+                lines.append(f"{stamps[i]}{senders[i]}: {MEDIA[config.platform]}")
+                continue
+
+            body = words[ends[i] - lengths[i]:ends[i]]
+            if multiline[i] and len(body) > 1:
+                cut = min(split_at[i], len(body) - 1)
+                text = ' '.join(body[:cut]) + '\n' + ' '.join(body[cut:])
+            else:
+                text = ' '.join(body)
+            if url[i]:
+                text += f" https://{DOMAINS[url_picks[i]]}/watch?v={start + i}"
+            if emoji[i]:
+                text += ' ' + EMOJIS[emoji_picks[i]]
+            lines.append(f"{stamps[i]}{senders[i]}: {text}")
+
+        yield '\n'.join(lines) + '\n'
+
+
+def generate_chat(**options):
+    """
+    A whole synthetic export as one string; options are ChatConfig fields
+    """
+    return ''.join(iter_chat(ChatConfig(**options)))
+
+
+def write_chat(path, **options):
+    """
+    Write a synthetic export to path block by block; options are ChatConfig fields
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        for text in iter_chat(ChatConfig(**options)):
+            f.write(text)
+    return path
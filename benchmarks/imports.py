@@ -0,0 +1,115 @@
+"""
+Check the dashboard's cold-start import budget
+
+    python -m benchmarks.imports --budget 0.8 --repeat 5
+
+Imports the modules app.py loads before the welcome screen in fresh
+interpreters, reports the median time and the slowest imports, and fails
+when the median exceeds the budget or when a dependency that should load
+lazily (on first use by a section) was imported.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Project modules app.py imports at startup, plus the section scheduler the first analysis
+# imports; none of them may load a deferred dependency
+STARTUP_MODULES = ('preprocessor', 'helper', 'cache', 'summary', 'sketches', 'profiling', 'scheduler')
+
+# Heavy dependencies that only the sections using them may import
+DEFERRED_MODULES = ('urlextract', 'wordcloud', 'emoji', 'matplotlib', 'seaborn')
+
+# Seconds; pandas alone takes most of it
+STARTUP_BUDGET = float(os.environ.get('WHATSAPP_ANALYZER_STARTUP_BUDGET', 1.0))
+
+PROBE = """
+import sys, time, json
+started = time.perf_counter()
+import {modules}
+seconds = time.perf_counter() - started
+print(json.dumps({{'seconds': seconds, 'loaded': [name for name in {deferred!r} if name in sys.modules]}}))
+"""
+
+
+def measure_once(modules=STARTUP_MODULES, deferred=DEFERRED_MODULES):
+    """
+    Import time and deferred modules loaded, in a fresh interpreter
+    """
+    code = PROBE.format(modules=', '.join(modules), deferred=deferred)
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_imports(modules=STARTUP_MODULES, top=10):
+    """
+    (cumulative microseconds, module) of the slowest imports, from python -X importtime
+    """
+    code = f"import {', '.join(modules)}"
+    lines = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, check=True,
+                           capture_output=True, text=True).stderr.splitlines()
+    timings = []
+    for line in lines:
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        timings.append((int(cumulative), name.strip()))
+    return sorted(timings, reverse=True)[:top]
+
+
+def run(repeat=5, budget=STARTUP_BUDGET):
+    """
+    Results document: median/min/max import seconds, budget and deferred modules loaded
+    """
+    samples = [measure_once() for _ in range(repeat)]
+    seconds = [sample['seconds'] for sample in samples]
+    loaded = sorted({name for sample in samples for name in sample['loaded']})
+    return {
+        'python': sys.version.split()[0],
+        'modules': list(STARTUP_MODULES),
+        'repeat': repeat,
+        'median_seconds': round(statistics.median(seconds), 4),
+        'min_seconds': round(min(seconds), 4),
+        'max_seconds': round(max(seconds), 4),
+        'budget_seconds': budget,
+        'deferred_loaded': loaded,
+        'slowest': [{'module': name, 'seconds': round(micros / 1e6, 4)}
+                    for micros, name in slowest_imports()],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the dashboard's startup import time")
+    parser.add_argument('--repeat', type=int, default=5, help="Fresh interpreters to time")
+    parser.add_argument('--budget', type=float, default=STARTUP_BUDGET, help="Allowed median seconds")
+    parser.add_argument('--output', default=None, help="Write the results JSON here")
+    args = parser.parse_args(argv)
+
+    results = run(args.repeat, args.budget)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    print(f"Startup imports: median {results['median_seconds']:.3f}s "
+          f"(min {results['min_seconds']:.3f}s, max {results['max_seconds']:.3f}s), "
+          f"budget {args.budget:.3f}s")
+    for entry in results['slowest']:
+        print(f"  {entry['seconds']:.3f}s  {entry['module']}")
+
+    failed = False
+    if results['deferred_loaded']:
+        print(f"FAIL: loaded at startup but should be lazy: {', '.join(results['deferred_loaded'])}")
+        failed = True
+    if results['median_seconds'] > args.budget:
+        print(f"FAIL: startup imports exceed the {args.budget:.3f}s budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
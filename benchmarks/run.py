@@ -0,0 +1,299 @@
+"""
+Time the parser and every analysis helper on synthetic chats
+
+    python -m benchmarks.run --sizes 10k,100k,1M,10M --output results.json
+    python -m benchmarks.run --sizes 10k,100k --baseline benchmarks/baseline.json
+    python -m benchmarks.run --sizes 10k,100k --baseline benchmarks/baseline.json --update-baseline
+
+Every case runs in a fresh process, so its peak memory is its own and no
+cache or index is shared between cases. Helpers run on a new ChatIndex of
+the compact frame the app analyses, for the Overall selection.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from benchmarks.generator import ChatConfig, write_chat
+
+DEFAULT_SIZES = '10k,100k,1M,10M'
+
+HELPERS = ('fetch_stats', 'distinct_counts', 'top_domains', 'most_busy_users', 'create_wordcloud',
+           'most_common_words', 'emoji_helper', 'monthly_timeline', 'daily_timeline',
+           'week_activity_map', 'month_activity_map', 'activity_heatmap')
+
+# preprocess must come first: it writes the frame the other cases load
+CASES = ('preprocess',) + HELPERS + ('analyze', 'analyze_concurrent')
+
+# Slowdowns below these are noise, whatever the ratio
+MIN_SECONDS = 0.05
+MIN_PEAK_MB = 16
+
+SUFFIXES = {'k': 1_000, 'm': 1_000_000}
+
+
+def parse_size(text):
+    """
+    Message count from '10k', '1M' or '2500'
+    """
+    text = text.strip().lower()
+    if text[-1:] in SUFFIXES:
+        return int(float(text[:-1]) * SUFFIXES[text[-1]])
+    return int(text)
+
+
+def size_label(size):
+    for suffix, factor in (('M', 1_000_000), ('k', 1_000)):
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{suffix}"
+    return str(size)
+
+
+def _memory_kb(field):
+    """
+    A memory field of /proc/self/status in kB, or None off Linux
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak():
+    """
+    Reset the process's peak RSS (Linux); False when the peak cannot be reset
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return _memory_kb('VmHWM') is not None
+    except OSError:
+        return False
+
+
+def measure(function):
+    """
+    (result, wall seconds, peak MB above the memory in use before the call)
+    """
+    resettable = _reset_peak()
+    if resettable:
+        before = _memory_kb('VmRSS')
+    else:
+        # ru_maxrss only grows, so a call below an earlier peak reports 0
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == 'darwin':
+            before //= 1024
+
+    started = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - started
+
+    if resettable:
+        peak = _memory_kb('VmHWM')
+    else:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == 'darwin':
+            peak //= 1024
+    return result, seconds, max(peak - before, 0) / 1024
+
+
+def run_case(case, chat_path, frame_path, repeat):
+    """
+    Process pool entry point: best wall time and largest peak over repeat runs of one case
+    """
+    import helper
+    import preprocessor
+    import scheduler
+
+    if case == 'preprocess':
+        def call():
+            return preprocessor.preprocess(chat_path)
+    else:
+        df = preprocessor.compact_schema(pd.read_parquet(frame_path))
+        function = getattr(helper, case, None)
+
+        def call():
+            index = helper.ChatIndex(df)
+            if case == 'analyze':
+                return helper.analyze(index, 'Overall')
+            if case == 'analyze_concurrent':
+                report = helper.analyze(index, 'Overall', lazy=True)
+                return list(scheduler.compute(report, helper.REPORT_SECTIONS))
+            if case == 'most_busy_users':
+                return function(index)
+            return function('Overall', index)
+
+    times, peaks = [], []
+    for _ in range(repeat):
+        result, seconds, peak = measure(call)
+        times.append(seconds)
+        peaks.append(peak)
+
+    if case == 'preprocess':
+        if result is None:
+            raise ValueError(f"Could not parse {chat_path}")
+        result.to_parquet(frame_path, index=False)
+
+    return {'seconds': round(min(times), 4), 'peak_mb': round(max(peaks), 1)}
+
+
+def chat_file(workdir, config):
+    """
+    Path of the synthetic export for config, generated on first use
+    """
+    name = '-'.join(f"{value}" for value in config) + '.txt'
+    path = os.path.join(workdir, name)
+    if not os.path.exists(path):
+        partial = path + '.partial'
+        write_chat(partial, **config._asdict())
+        os.replace(partial, path)
+    return path
+
+
+def run(sizes, cases=CASES, config=ChatConfig(), workdir=None, repeat=1):
+    """
+    Benchmark every case at every size and return the results document
+    """
+    workdir = workdir or os.path.join(tempfile.gettempdir(), 'whatsapp-benchmarks')
+    os.makedirs(workdir, exist_ok=True)
+    context = multiprocessing.get_context('spawn')
+    results = []
+
+    for size in sizes:
+        size_config = config._replace(messages=size)
+        started = time.perf_counter()
+        chat_path = chat_file(workdir, size_config)
+        print(f"{size_label(size)}: chat ready in {time.perf_counter() - started:.1f}s "
+              f"({os.path.getsize(chat_path) / 2 ** 20:.1f} MiB)", flush=True)
+        frame_path = os.path.splitext(chat_path)[0] + '.parquet'
+
+        # The helpers need the parsed frame, kept from an earlier run when preprocess is not timed
+        order = [case for case in CASES if case in cases]
+        if 'preprocess' not in cases and not os.path.exists(frame_path):
+            order.insert(0, 'preprocess')
+
+        for case in order:
+            record = {'size': size, 'case': case}
+            try:
+                # One process per case keeps peaks and caches independent
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    record.update(pool.submit(run_case, case, chat_path, frame_path, repeat).result())
+                record['messages_per_second'] = round(size / record['seconds'], 1) if record['seconds'] else None
+            except Exception as e:
+                record['error'] = f"{type(e).__name__}: {e}"
+
+            if case in cases:
+                results.append(record)
+                detail = record.get('error') or f"{record['seconds']:.3f}s, peak {record['peak_mb']:.1f} MB"
+                print(f"  {case}: {detail}", flush=True)
+
+    return {'meta': metadata(config, repeat), 'results': results}
+
+
+def metadata(config, repeat):
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'repeat': repeat,
+        'config': {name: value for name, value in config._asdict().items() if name != 'messages'},
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Cases slower or hungrier than the baseline by more than tolerance (a fraction)
+    """
+    previous = {(record['size'], record['case']): record
+                for record in baseline['results'] if 'error' not in record}
+    regressions = []
+    for record in results['results']:
+        before = previous.get((record['size'], record['case']))
+        if before is None or 'error' in record:
+            continue
+        for metric, floor in (('seconds', MIN_SECONDS), ('peak_mb', MIN_PEAK_MB)):
+            old, new = before[metric], record[metric]
+            if new > old * (1 + tolerance) and new - old > floor:
+                regressions.append({'size': record['size'], 'case': record['case'], 'metric': metric,
+                                    'baseline': old, 'current': new,
+                                    'ratio': round(new / old, 2) if old else None})
+    return regressions
+
+
+def main(argv=None):
+    defaults = ChatConfig()
+    parser = argparse.ArgumentParser(description="Benchmark the chat parser and analysis helpers")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help="Comma-separated message counts, e.g. 10k,1M")
+    parser.add_argument('--cases', default=','.join(CASES), help="Comma-separated cases to run")
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per case; the fastest is kept")
+    parser.add_argument('--output', default=None, help="Write the results JSON here")
+    parser.add_argument('--baseline', default=None, help="Compare against this results JSON")
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="Write the results to --baseline instead of comparing")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Allowed slowdown or memory growth as a fraction of the baseline")
+    parser.add_argument('--workdir', default=None, help="Where synthetic chats are generated and kept")
+    parser.add_argument('--users', type=int, default=defaults.users)
+    parser.add_argument('--multiline-ratio', type=float, default=defaults.multiline_ratio)
+    parser.add_argument('--emoji-density', type=float, default=defaults.emoji_density)
+    parser.add_argument('--url-density', type=float, default=defaults.url_density)
+    parser.add_argument('--media-density', type=float, default=defaults.media_density)
+    parser.add_argument('--platform', choices=('android', 'ios'), default=defaults.platform)
+    parser.add_argument('--clock', choices=('24h', '12h'), default=defaults.clock)
+    parser.add_argument('--seed', type=int, default=defaults.seed)
+    args = parser.parse_args(argv)
+
+    cases = tuple(case.strip() for case in args.cases.split(',') if case.strip())
+    unknown = [case for case in cases if case not in CASES]
+    if unknown:
+        parser.error(f"Unknown cases: {', '.join(unknown)} (choose from {', '.join(CASES)})")
+    if args.update_baseline and not args.baseline:
+        parser.error("--update-baseline needs --baseline")
+
+    config = defaults._replace(users=args.users, multiline_ratio=args.multiline_ratio,
+                               emoji_density=args.emoji_density, url_density=args.url_density,
+                               media_density=args.media_density, platform=args.platform,
+                               clock=args.clock, seed=args.seed)
+    sizes = [parse_size(size) for size in args.sizes.split(',') if size.strip()]
+    results = run(sizes, cases, config, args.workdir, args.repeat)
+
+    for path in filter(None, (args.output, args.baseline if args.update_baseline else None)):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {path}")
+
+    failed = [record for record in results['results'] if 'error' in record]
+    if args.baseline and not args.update_baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline['meta'].get('config') != results['meta']['config']:
+            print("Warning: the baseline was recorded with a different chat config", file=sys.stderr)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {size_label(regression['size'])} {regression['case']} {regression['metric']}: "
+                  f"{regression['baseline']} -> {regression['current']} (x{regression['ratio']})")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} of the baseline.")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,511 @@
+import hashlib
+import io
+import itertools
+import json
+import os
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import ingest
+import preprocessor
+
+# Where parsed chats (and the first and last bytes of their exports) are stored, shared by
+# every Streamlit worker on the machine; unset, nothing a user uploads is written to disk
+CACHE_DIR = os.environ.get('WHATSAPP_ANALYZER_CACHE_DIR') or None
+
+# Total size of cached Parquet files before the least recently used are evicted
+CACHE_MAX_BYTES = int(os.environ.get('WHATSAPP_ANALYZER_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+
+# Memory budget for parsed chats and analysis results kept in this process
+MEMORY_MAX_BYTES = int(os.environ.get('WHATSAPP_ANALYZER_MEMORY_MAX_BYTES', 512 * 1024 ** 2))
+
+HASH_CHUNK = 4 * 1024 * 1024
+
+# Raw bytes kept from the start and end of every cached export to recognise newer exports of it
+HEAD_BYTES = 256
+TAIL_BYTES = 4096
+
+
+def chat_key(source):
+    """
+    Content hash of an export combined with the parser version
+    """
+    digest = hashlib.sha256(f"parser-v{preprocessor.PARSER_VERSION}\n".encode('utf-8'))
+
+    if isinstance(source, str) and not preprocessor.is_path(source):
+        for start in range(0, len(source), HASH_CHUNK):
+            digest.update(source[start:start + HASH_CHUNK].encode('utf-8', 'surrogatepass'))
+    elif isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+                digest.update(chunk)
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+    elif isinstance(source, io.BytesIO):
+        # Hash the upload in place without copying it
+        digest.update(source.getbuffer())
+    else:
+        position = source.tell()
+        for chunk in iter(lambda: source.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+        source.seek(position)
+
+    return digest.hexdigest()
+
+
+def _path(key):
+    """
+    File holding the cached DataFrame for key
+    """
+    return os.path.join(CACHE_DIR, f"{key}.parquet")
+
+
+def _manifest_path(key):
+    """
+    File describing the raw export behind the cached DataFrame for key
+    """
+    return os.path.join(CACHE_DIR, f"{key}.json")
+
+
+def _write_atomic(path, write):
+    """
+    Write a cache file through a temporary file and rename so concurrent readers never see partial files
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load(key):
+    """
+    Return the cached DataFrame for key, or None on a miss
+    """
+    if CACHE_DIR is None:
+        return None
+    path = _path(key)
+    try:
+        df = pd.read_parquet(path)
+        # Reads refresh the entry's position in the LRU order
+        os.utime(path)
+        return df
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Error in cache load: {e}")
+        return None
+
+
+def store(key, df, max_bytes=None, manifest=None):
+    """
+    Atomically write a parsed DataFrame (and its export's manifest) to the cache and evict old entries
+    """
+    if CACHE_DIR is None:
+        return
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+
+        _write_atomic(_path(key), lambda f: df.to_parquet(f, index=False))
+        if manifest is not None:
+            data = json.dumps(dict(manifest, key=key, rows=len(df))).encode('utf-8')
+            _write_atomic(_manifest_path(key), lambda f: f.write(data))
+
+        evict(CACHE_MAX_BYTES if max_bytes is None else max_bytes)
+
+    except Exception as e:
+        print(f"Error in cache store: {e}")
+
+
+def evict(max_bytes=None):
+    """
+    Delete least recently used entries until the cache fits in max_bytes
+    """
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+
+    entries = []
+    for entry in _entries():
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            # Removed by another worker
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        _remove(path)
+        total -= size
+
+
+def invalidate(key):
+    """
+    Remove a single cached chat, from disk and from memory with everything derived from it
+    """
+    if CACHE_DIR is not None:
+        _remove(_path(key))
+    # ('chat', key, ...), ('index', key), ('summary', key, ...) and ('report', key, ...)
+    memory.discard(lambda entry: entry[1:2] == (key,))
+
+
+def clear():
+    """
+    Remove every cached chat and analysis result
+    """
+    memory.clear()
+    for entry in _entries():
+        _remove(entry.path)
+
+
+def _remove(path):
+    """
+    Delete a cached Parquet file and its manifest, if still present
+    """
+    for target in (path, path[:-len('.parquet')] + '.json'):
+        try:
+            os.remove(target)
+        except FileNotFoundError:
+            pass
+
+
+def _entries():
+    """
+    Cached Parquet files currently on disk
+    """
+    if CACHE_DIR is None or not os.path.isdir(CACHE_DIR):
+        return []
+    return [entry for entry in os.scandir(CACHE_DIR) if entry.name.endswith('.parquet')]
+
+
+def fingerprint(chunks):
+    """
+    Manifest of a raw export: length, hash, and its first and last bytes
+    """
+    return scan(chunks, [])[0]
+
+
+def _manifests():
+    """
+    Manifests of the cached exports parsed by the current parser
+    """
+    manifests = []
+    for entry in _entries():
+        try:
+            with open(entry.path[:-len('.parquet')] + '.json', 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            continue
+        if manifest.get('parser_version') == preprocessor.PARSER_VERSION:
+            manifests.append(manifest)
+    # Longest first: the most recent export of a chat covers the most messages
+    return sorted(manifests, key=lambda manifest: manifest['length'], reverse=True)
+
+
+def scan(chunks, manifests):
+    """
+    Fingerprint of a raw export and the cached export it extends, in one streaming pass
+
+    Returns (manifest of these bytes, (cached manifest, offset where the new
+    messages start) or None). An upload extends a cached export when it starts
+    with the same bytes, or failing that when the cached export's last message
+    appears in it followed by more lines (the newer export dropped some of the
+    oldest messages). Only the chunk being read and a few KB are in memory.
+    """
+    chunks = iter(chunks)
+    first = b''
+    for chunk in chunks:
+        first += chunk
+        if len(first) >= HEAD_BYTES:
+            break
+    head = first[:HEAD_BYTES]
+
+    # Only exports with the same first bytes can be a prefix; their hashes are checked as their length is reached
+    prefixes = sorted((manifest for manifest in manifests if head.startswith(bytes.fromhex(manifest['head']))),
+                      key=lambda manifest: manifest['length'])
+    matched = []
+    # Exports end with a line break, which is followed by the next message in a newer export
+    tails = [bytes.fromhex(manifest['tail']).rstrip(b'\r\n') for manifest in manifests]
+    # Offset just after the last occurrence of each tail, and whether a line break follows it
+    endings = [None] * len(manifests)
+
+    digest = hashlib.sha256()
+    length = 0
+    tail = b''
+    for chunk in itertools.chain([first], chunks):
+        while prefixes and prefixes[0]['length'] <= length + len(chunk):
+            manifest = prefixes.pop(0)
+            partial = digest.copy()
+            partial.update(chunk[:manifest['length'] - length])
+            if partial.hexdigest() == manifest['digest']:
+                matched.append(manifest)
+        digest.update(chunk)
+
+        # A tail is only searched where the byte after it has been read too
+        window = tail + chunk
+        for i, needle in enumerate(tails):
+            found = window.rfind(needle, 0, len(window) - 1) if needle else -1
+            if found != -1:
+                end = length - len(tail) + found + len(needle)
+                endings[i] = (end, window[found + len(needle):found + len(needle) + 1] in (b'\n', b'\r'))
+
+        length += len(chunk)
+        tail = window[-TAIL_BYTES:]
+
+    fingerprint = {'parser_version': preprocessor.PARSER_VERSION, 'length': length,
+                   'digest': digest.hexdigest(), 'head': head.hex(), 'tail': tail.hex()}
+
+    # Longest first: the most recent export of a chat covers the most messages
+    prefixes = [manifest for manifest in matched if manifest['length'] < length]
+    if prefixes:
+        return fingerprint, (prefixes[-1], prefixes[-1]['length'])
+    for manifest, ending in zip(manifests, endings):
+        if ending is not None and ending[1]:
+            return fingerprint, (manifest, ending[0])
+    return fingerprint, None
+
+
+def _raw_from(source, offset):
+    """
+    Undecoded bytes of source from offset on
+    """
+    parts = []
+    position = 0
+    for chunk in _iter_raw(source):
+        if position + len(chunk) > offset:
+            parts.append(chunk[max(0, offset - position):])
+        position += len(chunk)
+    return b''.join(parts)
+
+
+def extend_cached(source, manifest, offset):
+    """
+    Parse only the messages after offset, which extend the cached export of manifest, and append them
+
+    Returns (DataFrame, cached chat's key, rows taken from the cached chat),
+    or None when the new bytes cannot be parsed on their own.
+    """
+    try:
+        encoding = ingest.sniff_encoding(next(_iter_raw(source), b'')[:ingest.SNIFF_BYTES])
+        if encoding == 'utf-16':
+            # The new bytes can't be decoded on their own
+            return None
+        if encoding == 'utf-8-sig':
+            encoding = 'utf-8'
+
+        base = load(manifest['key'])
+        chat_format = preprocessor.FORMATS_BY_NAME.get(base.attrs.get('chat_format')) if base is not None else None
+        if chat_format is None:
+            return None
+
+        text = _raw_from(source, offset).decode(encoding, errors='replace')
+        if not chat_format.header.match(text.lstrip()):
+            # The new bytes do not start at a message boundary
+            return None
+
+        new = preprocessor.parse_messages(text, chat_format)
+        df = pd.concat([base, new], ignore_index=True) if len(new) else base.copy()
+        df.attrs = dict(base.attrs)
+        return df, manifest['key'], len(base)
+
+    except Exception as e:
+        print(f"Error in incremental parse: {e}")
+        return None
+
+
+# Items sized one by one in object arrays and long lists; larger ones are estimated from a sample
+SIZE_SAMPLE = 1000
+
+
+def _objects_nbytes(items):
+    """
+    Approximate memory of the objects in a sequence, from an even sample when it is long
+    """
+    if len(items) <= SIZE_SAMPLE:
+        return sum(nbytes(item) for item in items)
+    step = len(items) / SIZE_SAMPLE
+    sample = [items[int(i * step)] for i in range(SIZE_SAMPLE)]
+    return int(sum(nbytes(item) for item in sample) * step)
+
+
+def nbytes(value):
+    """
+    Approximate memory held by a cached value
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(np.sum(value.memory_usage(deep=True)))
+    if isinstance(value, np.ndarray) and value.dtype == object:
+        # The pointers plus the strings they point to
+        return int(value.nbytes) + _objects_nbytes(value.ravel())
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + _objects_nbytes(value)
+    return sys.getsizeof(value)
+
+
+class MemoryCache:
+    """
+    In-process LRU cache bounded by an approximate memory budget
+
+    Module-level, so every Streamlit session served by this process shares
+    it. Values are sized once when stored; a value larger than the whole
+    budget is returned to the caller but never kept.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = nbytes(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            if size > self.max_bytes:
+                return value
+            self._entries[key] = (value, size)
+            self._bytes += size
+            self._evict()
+        return value
+
+    def resize(self, key):
+        """
+        Size an entry's value again after it grew in place, e.g. when a lazy component was built
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return
+        # Sized outside the lock; the entry is only updated if it is still the same value
+        size = nbytes(entry[0])
+        with self._lock:
+            current = self._entries.get(key)
+            if current is None or current[0] is not entry[0]:
+                return
+            self._bytes += size - current[1]
+            if size > self.max_bytes:
+                del self._entries[key]
+                self._bytes -= size
+            else:
+                self._entries[key] = (current[0], size)
+            self._evict()
+
+    def discard(self, matches):
+        """
+        Drop every entry whose key matches
+        """
+        with self._lock:
+            for key in [key for key in self._entries if matches(key)]:
+                self._bytes -= self._entries.pop(key)[1]
+
+    def _evict(self):
+        # Least recently used entries go first; the caller holds the lock
+        while self._bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+            self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """
+        Cached value for key, computing and storing it on a miss (None is not stored)
+        """
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """
+        Hit/miss counters and current size
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'entries': len(self._entries), 'bytes': self._bytes,
+                    'max_bytes': self.max_bytes}
+
+
+memory = MemoryCache(MEMORY_MAX_BYTES)
+
+
+def _iter_raw(source):
+    """
+    Undecoded chat text of any source preprocessor.preprocess accepts
+    """
+    if isinstance(source, str) and not preprocessor.is_path(source):
+        yield source.encode('utf-8', 'surrogatepass')
+    else:
+        yield from ingest.iter_bytes(source)
+
+
+def cached_preprocess(source, workers=1, compact=False, key=None):
+    """
+    preprocessor.preprocess backed by the in-memory and on-disk caches
+    """
+    key = chat_key(source) if key is None else key
+
+    def parse():
+        df = load(key)
+        if df is not None:
+            return preprocessor.compact_schema(df) if compact else df
+
+        extended = None
+        manifest = None
+        manifests = _manifests()
+        if manifests:
+            # A newer export of a cached chat only needs its new messages parsed
+            manifest, found = scan(_iter_raw(source), manifests)
+            if found is not None:
+                extended = extend_cached(source, *found)
+
+        if extended is not None:
+            df, base_key, base_rows = extended
+        else:
+            df = preprocessor.preprocess(source, workers=workers)
+            if df is None:
+                return None
+        if CACHE_DIR is not None:
+            if manifest is None:
+                manifest = fingerprint(_iter_raw(source))
+            store(key, df, manifest=manifest)
+
+        if compact:
+            df = preprocessor.compact_schema(df)
+        if extended is not None:
+            # Lets helper.chat_index extend the cached chat's index instead of rebuilding it
+            df.attrs['extends'] = base_key
+            df.attrs['extends_rows'] = base_rows
+        return df
+
+    return memory.get_or_compute(('chat', key, compact), parse)
@@ -0,0 +1,206 @@
+"""
+Chart rendering helpers: timeline downsampling, cached figures and native chart specs
+
+A multi-year chat has thousands of daily points, many more than a chart is
+pixels wide. Timelines are reduced with Largest-Triangle-Three-Buckets,
+which keeps the peaks and dips that give the line its shape. Static figures
+are rasterised once per chart, user and data and kept in cache.memory as
+PNG bytes, so reruns and other sessions skip matplotlib. The native backend
+instead sends small Vega-Lite specs that the browser draws itself.
+"""
+import datetime
+import hashlib
+import io
+import numpy as np
+import pandas as pd
+import cache
+
+# Points a timeline is reduced to; a dashboard column is narrower than this in pixels
+TIMELINE_POINTS = 600
+
+# Labels shown on a month axis; the rest would overlap
+MAX_TICKS = 24
+
+# Resolution static figures are rasterised at, as st.pyplot does
+DPI = 200
+
+# Widest image st.image sends as is; wider ones are resized and re-encoded on every rerun
+MAX_WIDTH = 1460
+
+# Bump when a figure's drawing code changes, so cached images are redrawn
+CHARTS_VERSION = 1
+
+
+def lttb(x, y, threshold=TIMELINE_POINTS):
+    """
+    Positions of the points Largest-Triangle-Three-Buckets keeps (all of them when there are fewer)
+
+    The first and last points are always kept. The points between are split
+    into threshold - 2 buckets, and from each the point forming the largest
+    triangle with the previously kept point and the next bucket's average.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # The last bucket looks ahead to the final point only
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x, next_y = x[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        keep[bucket + 1] = previous
+    return keep
+
+
+def downsample(frame, x, y, threshold=TIMELINE_POINTS):
+    """
+    Positions of the rows of frame to plot, plotting column y against column x
+    """
+    if len(frame) <= threshold:
+        return np.arange(len(frame))
+    values = frame[x]
+    if pd.api.types.is_datetime64_any_dtype(values) or isinstance(values.iloc[0], datetime.date):
+        # Days are spaced by the time between them, so gaps in the chat stay gaps
+        positions = pd.to_datetime(values).to_numpy().astype('datetime64[D]').astype(np.float64)
+    else:
+        # Labels such as "Jan 2019" are evenly spaced
+        positions = np.arange(len(frame), dtype=np.float64)
+    return lttb(positions, frame[y].to_numpy(dtype=np.float64), threshold)
+
+
+def ticks(count, max_ticks=MAX_TICKS):
+    """
+    Evenly spread positions to label on an axis of count categories
+    """
+    return np.unique(np.linspace(0, count - 1, min(count, max_ticks)).round().astype(np.int64))
+
+
+def digest(value):
+    """
+    Content hash of the frames, series and plain values a chart is drawn from
+    """
+    h = hashlib.blake2b(digest_size=16)
+
+    def update(value):
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            h.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+            labels = value.columns if isinstance(value, pd.DataFrame) else [value.name]
+            h.update(repr(list(labels)).encode())
+        elif isinstance(value, (tuple, list)):
+            for item in value:
+                update(item)
+        else:
+            h.update(repr(value).encode())
+
+    update(value)
+    return h.hexdigest()
+
+
+def to_png(image):
+    """
+    PNG bytes of a matplotlib figure (closed afterwards) or a PIL image
+    """
+    buffer = io.BytesIO()
+    if hasattr(image, 'savefig'):
+        import matplotlib.pyplot as plt
+        try:
+            # Rasterised no wider than MAX_WIDTH, so the cached bytes are what the browser gets
+            dpi = min(DPI, MAX_WIDTH / image.get_figwidth())
+            image.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight')
+        finally:
+            plt.close(image)
+    else:
+        image.save(buffer, format='png')
+    return buffer.getvalue()
+
+
+def figure(name, user, data, draw):
+    """
+    PNG bytes of a chart, drawn once per chart, user and data
+
+    draw() returns a matplotlib figure or PIL image and only runs on a cache
+    miss; data is whatever the drawing depends on.
+    """
+    key = ('figure', name, user, digest(data), CHARTS_VERSION)
+    return cache.memory.get_or_compute(key, lambda: to_png(draw()))
+
+
+def series_frame(series, label, value):
+    """
+    A Series as a two-column frame of its labels and values, for a native chart
+    """
+    return pd.DataFrame({label: series.index.astype(str), value: series.to_numpy()})
+
+
+def line_spec(x, y, x_title, y_title, color, temporal=False, points=False):
+    """
+    Vega-Lite line chart of y against x, in data order
+    """
+    return {
+        'height': 400,
+        'mark': {'type': 'line', 'color': color, 'point': points, 'tooltip': True},
+        'encoding': {
+            'x': {'field': x, 'type': 'temporal' if temporal else 'ordinal', 'sort': None,
+                  'title': x_title, 'axis': {'labelAngle': -45}},
+            'y': {'field': y, 'type': 'quantitative', 'title': y_title},
+        },
+    }
+
+
+def bar_spec(label, value, label_title, value_title, scheme, horizontal=False):
+    """
+    Vega-Lite bar chart with one bar per label, in data order
+    """
+    label_axis = 'y' if horizontal else 'x'
+    value_axis = 'x' if horizontal else 'y'
+    return {
+        'height': 400,
+        'mark': {'type': 'bar', 'tooltip': True},
+        'encoding': {
+            label_axis: {'field': label, 'type': 'nominal', 'sort': None, 'title': label_title,
+                         'axis': {'labelAngle': 0 if horizontal else -45}},
+            value_axis: {'field': value, 'type': 'quantitative', 'title': value_title},
+            'color': {'field': label, 'type': 'nominal', 'sort': None, 'legend': None,
+                      'scale': {'scheme': scheme}},
+        },
+    }
+
+
+def heatmap_spec(x, y, value, x_title, y_title, value_title):
+    """
+    Vega-Lite heatmap of value by x and y, both in data order
+    """
+    return {
+        'height': 400,
+        'mark': {'type': 'rect', 'stroke': 'gray', 'strokeWidth': 0.5, 'tooltip': True},
+        'encoding': {
+            'x': {'field': x, 'type': 'ordinal', 'sort': None, 'title': x_title},
+            'y': {'field': y, 'type': 'ordinal', 'sort': None, 'title': y_title},
+            'color': {'field': value, 'type': 'quantitative', 'title': value_title,
+                      'scale': {'scheme': 'yellowgreenblue'}},
+        },
+    }
+
+
+def pie_spec(label, value, scheme):
+    """
+    Vega-Lite pie chart of value by label
+    """
+    return {
+        'height': 400,
+        'mark': {'type': 'arc', 'tooltip': True},
+        'encoding': {
+            'theta': {'field': value, 'type': 'quantitative'},
+            'color': {'field': label, 'type': 'nominal', 'sort': None,
+                      'scale': {'scheme': scheme}},
+        },
+    }
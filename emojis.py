@@ -0,0 +1,108 @@
+import re
+import threading
+from functools import lru_cache
+
+
+def char_class(chars):
+    """
+    Regex character class for a set of characters, compressed into code point ranges
+    """
+    ranges = []
+    for code in sorted(set(map(ord, chars))):
+        if ranges and code == ranges[-1][1] + 1:
+            ranges[-1][1] = code
+        else:
+            ranges.append([code, code])
+    return '[' + ''.join(re.escape(chr(start)) if start == end else
+                         re.escape(chr(start)) + '-' + re.escape(chr(end))
+                         for start, end in ranges) + ']'
+
+
+def _trie_pattern(sequences):
+    """
+    Regex matching any of the sequences, preferring the longest, built from a prefix trie
+    """
+    trie = {}
+    for sequence in sequences:
+        node = trie
+        for char in sequence:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        leaves = [char for char, child in node.items() if char and list(child) == ['']]
+        branches = [re.escape(char) + build(child)
+                    for char, child in sorted(node.items()) if char and char not in leaves]
+        if leaves:
+            branches.append(char_class(leaves) if len(leaves) > 1 else re.escape(leaves[0]))
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # Greedy optional tail: longer sequences (skin tones, ZWJ, keycaps) win
+        if '' in node:
+            pattern = '(?:' + pattern + ')?'
+        return pattern
+
+    return build(trie)
+
+
+# Cheap first stage: every emoji lies inside a run of non-ASCII characters or is an ASCII keycap
+CANDIDATE_RE = re.compile('[^\\x00-\\x7f]+|[#*0-9]\\ufe0f?\\u20e3')
+
+_emoji_re = None
+_lock = threading.Lock()
+
+
+def emoji_re():
+    """
+    Whole emoji sequences (ZWJ families, skin tones, flags, keycaps) as single matches
+
+    Importing the emoji data and compiling the pattern takes a while, so it
+    is done once per process, on first use.
+    """
+    global _emoji_re
+    if _emoji_re is None:
+        with _lock:
+            if _emoji_re is None:
+                import emoji
+                _emoji_re = re.compile(_trie_pattern(emoji.EMOJI_DATA))
+    return _emoji_re
+
+
+def iter_emojis(text):
+    """
+    Yield (offset, emoji) for every emoji sequence in text, in order
+    """
+    pattern = emoji_re()
+    for run in CANDIDATE_RE.finditer(text):
+        start = run.start()
+        for match in pattern.finditer(run.group()):
+            yield start + match.start(), match.group()
+
+
+def find_emojis(text):
+    """
+    All emoji sequences in text, in order
+    """
+    pattern = emoji_re()
+    return [found for run in CANDIDATE_RE.findall(text) for found in pattern.findall(run)]
+
+
+def strip_emojis(text):
+    """
+    Text with every emoji sequence removed
+    """
+    pattern = emoji_re()
+    return CANDIDATE_RE.sub(lambda run: pattern.sub('', run.group()), text)
+
+
+@lru_cache(maxsize=None)
+def describe(emoji_char):
+    """
+    Human-readable name of an emoji, computed once per distinct emoji
+    """
+    try:
+        import emoji
+        return emoji.demojize(emoji_char).replace(':', '').replace('_', ' ').title()
+    except Exception:
+        return "Unknown Emoji"
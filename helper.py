@@ -1,64 +1,304 @@
-from urlextract import URLExtract
-from wordcloud import WordCloud
 import pandas as pd
 from collections import Counter
-import emoji
-import re
+from functools import cached_property
+import emojis
 import numpy as np
 from datetime import datetime
+from tokens import DOMAIN_RE, TokenStore
+from preprocessor import DAYS_ORDER, MONTHS_ORDER, MessageKind, message_kinds
+from timecube import TimeCube, day_index, month_index
+from summary import ChatSummary
+import cache
+import profiling
 
-extract = URLExtract()
+# Bump when any helper's output changes so memoized results are not reused
+ANALYSIS_VERSION = 1
 
+
+class ChatIndex:
+    """
+    Row positions of every user in a preprocessed chat, built once after preprocessing
+
+    key is the chat's content hash; when given, analysis results are memoized
+    in cache.memory and shared by every session analysing the same chat.
+    """
+
+    def __init__(self, df, key=None):
+        self.df = df
+        self.key = key
+        # user -> integer row positions, computed in one groupby
+        self.positions = df.groupby('user', observed=True, sort=False).indices
+
+    @property
+    def users(self):
+        return list(self.positions)
+
+    @property
+    def nbytes(self):
+        """
+        Memory the index keeps alive: the DataFrame, the row positions and the
+        token store and time cube once built
+
+        Components are built after the index is cached, so the report that
+        builds one has the cache size the entry again (MemoryCache.resize).
+        """
+        size = cache.nbytes(self.df) + sum(rows.nbytes for rows in self.positions.values())
+        for name in ('tokens', 'time_cube'):
+            if name in self.__dict__:
+                size += self.__dict__[name].nbytes
+        return size
+
+    @property
+    def components(self):
+        """
+        Names of the lazily built parts of the index and its token store
+        """
+        built = [name for name in ('tokens', 'time_cube') if name in self.__dict__]
+        if 'tokens' in self.__dict__:
+            built += list(self.tokens.__dict__)
+        return frozenset(built)
+
+    @cached_property
+    def participants(self):
+        """
+        Users with at least one non-system message
+        """
+        users = self.df['user'][message_kinds(self.df) != MessageKind.SYSTEM]
+        return [str(user) for user in users.unique()]
+
+    @cached_property
+    def tokens(self):
+        """
+        Shared tokenization of the whole chat, built on first use
+        """
+        return TokenStore(self.df)
+
+    @cached_property
+    @profiling.timed('time_cube', rows=lambda result, index: len(index.df))
+    def time_cube(self):
+        """
+        User x date x hour message counts, built on first use
+        """
+        return TimeCube(self.df)
+
+    def extend(self, df, key=None):
+        """
+        Index of df, whose first rows are this index's chat, merging instead of rebuilding
+
+        Only the new rows are grouped, tokenized and counted; row positions,
+        the token store and the time cube are additive, so they are merged.
+        """
+        start = len(self.df)
+        tail = ChatIndex(df.iloc[start:])
+
+        index = ChatIndex.__new__(ChatIndex)
+        index.df = df
+        index.key = key
+        index.positions = dict(self.positions)
+        for user, rows in tail.positions.items():
+            rows = rows + start
+            index.positions[user] = np.concatenate([index.positions[user], rows]) \
+                if user in index.positions else rows
+
+        if 'participants' in self.__dict__:
+            known = set(self.participants)
+            index.participants = self.participants + [user for user in tail.participants
+                                                      if user not in known]
+        if 'tokens' in self.__dict__:
+            index.tokens = self.tokens.extend(df, tail.tokens)
+        if 'time_cube' in self.__dict__:
+            index.time_cube = self.time_cube.merge(tail.time_cube)
+        return index
+
+    def rows(self, selected_user):
+        """
+        Row positions of selected_user, or None for 'Overall'
+        """
+        if selected_user == 'Overall':
+            return None
+        return self.positions.get(selected_user, np.array([], dtype=np.intp))
+
+    def select(self, selected_user):
+        """
+        Rows of selected_user (or the whole chat for 'Overall') in O(slice size)
+        """
+        if selected_user == 'Overall':
+            return self.df
+        rows = self.positions.get(selected_user)
+        if rows is None:
+            return self.df.iloc[0:0]
+        return self.df.iloc[rows]
+
+
+def chat_index(df, key):
+    """
+    Shared ChatIndex of a cached chat, extended from the chat it continues when that index is in memory
+    """
+    def build():
+        base_key = df.attrs.get('extends')
+        base = cache.memory.get(('index', base_key)) if base_key else None
+        if base is not None and len(base.df) == df.attrs.get('extends_rows'):
+            return base.extend(df, key=key)
+        return ChatIndex(df, key=key)
+
+    return cache.memory.get_or_compute(('index', key), build)
+
+
+def select_user(selected_user, data):
+    """
+    Messages of selected_user from a ChatIndex or a plain DataFrame
+    """
+    if isinstance(data, ChatIndex):
+        return data.select(selected_user)
+    if selected_user != 'Overall':
+        return data[data['user'] == selected_user]
+    return data
+
+
+def text_view(selected_user, data):
+    """
+    Token store and the row positions of selected_user within it (None = all rows)
+    """
+    if isinstance(data, ChatIndex):
+        return data.tokens, data.rows(selected_user)
+    return TokenStore(select_user(selected_user, data)), None
+
+
+def time_view(selected_user, data):
+    """
+    Time cube and the users to reduce it over (None = whole chat)
+    """
+    if isinstance(data, (ChatIndex, ChatSummary)):
+        return data.time_cube, (None if selected_user == 'Overall' else [selected_user])
+    return TimeCube(select_user(selected_user, data)), None
+
+
+def word_view(selected_user, data):
+    """
+    User x word counts and the users to reduce them over (None = all users in it)
+    """
+    if isinstance(data, ChatSummary):
+        return data.word_matrix, data.selection(selected_user)
+    store, rows = text_view(selected_user, data)
+    return store.word_matrix, (None if rows is None else [selected_user])
+
+
+def chat_frame(data):
+    """
+    The full chat DataFrame behind a ChatIndex or a plain DataFrame
+    """
+    return data.df if isinstance(data, ChatIndex) else data
+
+
+def selected_rows(result, selected_user, data, *args, **kwargs):
+    """
+    Messages of selected_user in data: the rows a helper call covers, for profiling
+    """
+    if isinstance(data, ChatSummary):
+        return data.stats(selected_user)[0]
+    if isinstance(data, ChatIndex):
+        rows = data.rows(selected_user)
+        return len(data.df) if rows is None else len(rows)
+    return len(select_user(selected_user, data))
+
+@profiling.timed('helper.fetch_stats', rows=selected_rows)
 def fetch_stats(selected_user, df):
     """
     Fetch basic statistics for selected user
     """
     try:
-        if selected_user != 'Overall':
-            df = df[df['user'] == selected_user]
+        if isinstance(df, ChatSummary):
+            return df.stats(selected_user)
+
+        store, rows = text_view(selected_user, df)
+        all_rows = rows is None
 
         # Number of messages
-        num_messages = df.shape[0]
+        num_messages = store.size if all_rows else len(rows)
 
         # Number of words
-        words = []
-        for message in df['message'].dropna():
-            words.extend(message.split())
+        words = store.word_counts.sum() if all_rows else store.word_counts[rows].sum()
 
         # Media messages
-        media_patterns = ['Media omitted', 'image omitted', 'video omitted',
-                         'audio omitted', 'document omitted', '<Media omitted>']
-        media_conditions = df['message'].str.contains('|'.join(media_patterns),
-                                                     case=False, na=False)
-        num_media_messages = media_conditions.sum()
+        num_media_messages = store.media.sum() if all_rows else store.media[rows].sum()
 
         # Links
-        links = []
-        for message in df['message'].dropna():
-            urls = extract.find_urls(message)
-            if urls:
-                links.extend(urls)
+        links = store.url_counts.sum() if all_rows else store.url_counts[rows].sum()
 
-        return num_messages, len(words), num_media_messages, len(links)
+        return num_messages, int(words), int(num_media_messages), int(links)
 
     except Exception as e:
         print(f"Error in fetch_stats: {e}")
         return 0, 0, 0, 0
 
+@profiling.timed('helper.distinct_counts', rows=selected_rows)
+def distinct_counts(selected_user, df):
+    """
+    Distinct words used and number of participants
+    """
+    try:
+        if isinstance(df, ChatSummary):
+            return df.distinct(selected_user)
+
+        word_matrix, users = word_view(selected_user, df)
+        frame = select_user(selected_user, df)
+        senders = frame['user'][message_kinds(frame) != MessageKind.SYSTEM]
+
+        return len(word_matrix.used(users)[0]), int(senders.nunique())
+
+    except Exception as e:
+        print(f"Error in distinct_counts: {e}")
+        return 0, 0
+
+@profiling.timed('helper.top_domains', rows=selected_rows)
+def top_domains(selected_user, df, top_n=10):
+    """
+    Most frequently shared link domains
+    """
+    try:
+        if isinstance(df, ChatSummary):
+            counts = df.domain_counts(selected_user)
+            if counts.empty:
+                return pd.DataFrame(columns=['Domain', 'Links'])
+            counts = counts.sort_values(ascending=False, kind='stable').head(top_n)
+        else:
+            store, rows = text_view(selected_user, df)
+
+            # URLs extracted once per chat by the token store
+            urls = pd.Series(store.urls_for(rows), dtype=object)
+            if urls.empty:
+                return pd.DataFrame(columns=['Domain', 'Links'])
+
+            domains = urls.str.extract(DOMAIN_RE)[0].str.lower()
+            counts = domains.value_counts().head(top_n)
+
+        return pd.DataFrame({'Domain': counts.index, 'Links': counts.values})
+
+    except Exception as e:
+        print(f"Error in top_domains: {e}")
+        return pd.DataFrame()
+
+@profiling.timed('helper.most_busy_users', rows=lambda result, df: selected_rows(result, 'Overall', df))
 def most_busy_users(df):
     """
     Identify most active users in the chat
     """
     try:
-        # Exclude system messages
-        system_messages = ['group_notification', 'Notification', 'notification', 'System']
-        filtered_df = df[~df['user'].isin(system_messages)]
+        if isinstance(df, ChatSummary):
+            user_counts, total = df.busy_counts()
+        else:
+            df = chat_frame(df)
+
+            # Exclude system messages
+            filtered_df = df[message_kinds(df) != MessageKind.SYSTEM]
+            user_counts, total = filtered_df['user'].value_counts(), len(filtered_df)
 
-        # Get top 10 users
-        user_counts = filtered_df['user'].value_counts().head(10)
+        # Get top 10 users (categorical users also report unused categories, so drop zeros)
+        user_counts = user_counts[user_counts > 0].head(10)
+        user_counts.index = user_counts.index.astype(str)
 
         # Calculate percentages - FIXED: Use list comprehension for rounding
-        percentages = [(count / len(filtered_df)) * 100 for count in user_counts.values]
+        percentages = [(count / total) * 100 for count in user_counts.values]
         rounded_percentages = [round(p, 2) for p in percentages]
 
         # Create dataframe
@@ -74,55 +314,28 @@ def most_busy_users(df):
         print(f"Error in most_busy_users: {e}")
         return pd.Series(), pd.DataFrame()
 
+@profiling.timed('helper.create_wordcloud', rows=selected_rows)
 def create_wordcloud(selected_user, df):
     """
     Create word cloud from messages
     """
     try:
-        # Load stop words
-        stop_words = set()
-        try:
-            with open('stop_hinglish.txt', 'r', encoding='utf-8') as f:
-                stop_words = set(f.read().split())
-        except FileNotFoundError:
-            # Use basic English stop words
-            stop_words = set(['the', 'and', 'to', 'of', 'i', 'a', 'you', 'is', 'that', 'it',
-                             'in', 'my', 'for', 'me', 'on', 'this', 'with', 'but', 'have',
-                             'are', 'was', 'be', 'so', 'just', 'like', 'not', 'at'])
-
-        if selected_user != 'Overall':
-            df = df[df['user'] == selected_user]
-
-        # Filter out system messages and media
-        temp = df[
-            (~df['user'].isin(['group_notification', 'Notification'])) &
-            (~df['message'].str.contains('Media omitted|image omitted|video omitted',
-                                        case=False, na=False))
-        ].copy()
-
-        if temp.empty:
-            return None
-
-        # Clean messages
-        def clean_message(msg):
-            if not isinstance(msg, str):
-                return ""
-            # Remove URLs
-            msg = re.sub(r'http\S+', '', msg)
-            # Remove emojis
-            msg = ''.join(char for char in msg if char not in emoji.EMOJI_DATA)
-            # Remove special characters
-            msg = re.sub(r'[^\w\s]', '', msg)
-            # Remove stop words
-            words = [word for word in msg.lower().split() if word not in stop_words and len(word) > 2]
-            return ' '.join(words)
-
-        temp['cleaned_message'] = temp['message'].apply(clean_message)
-
-        # Combine all messages
-        text = ' '.join(temp['cleaned_message'].dropna())
-
-        if not text.strip():
+        # wordcloud pulls in matplotlib, so it is only imported when a cloud is drawn
+        from wordcloud import WordCloud, STOPWORDS
+
+        word_matrix, users = word_view(selected_user, df)
+
+        # Word frequencies straight from the precomputed user x word counts,
+        # skipping the word cloud's own English stop words as generate() would
+        max_words = 200
+        frequencies = {
+            word: count
+            for word, count in word_matrix.top(max_words + len(STOPWORDS), users)
+            if word not in STOPWORDS
+        }
+        frequencies = dict(list(frequencies.items())[:max_words])
+
+        if not frequencies:
             return None
 
         # Generate word cloud
@@ -131,58 +344,27 @@ def create_wordcloud(selected_user, df):
             height=400,
             background_color='white',
             min_font_size=10,
-            max_words=200,
+            max_words=max_words,
             colormap='viridis'
         )
 
-        return wc.generate(text)
+        with profiling.stage('wordcloud.generate', rows=len(frequencies)):
+            return wc.generate_from_frequencies(frequencies)
 
     except Exception as e:
         print(f"Error in create_wordcloud: {e}")
         return None
 
+@profiling.timed('helper.most_common_words', rows=selected_rows)
 def most_common_words(selected_user, df, top_n=20):
     """
     Find most common words in messages
     """
     try:
-        # Load stop words
-        stop_words = set()
-        try:
-            with open('stop_hinglish.txt', 'r', encoding='utf-8') as f:
-                stop_words = set(f.read().split())
-        except FileNotFoundError:
-            stop_words = set(['the', 'and', 'to', 'of', 'i', 'a', 'you', 'is', 'that', 'it',
-                             'in', 'my', 'for', 'me', 'on', 'this', 'with', 'but', 'have',
-                             'are', 'was', 'be', 'so', 'just', 'like', 'not', 'at', 'hi',
-                             'hello', 'hey', 'ok', 'okay', 'yes', 'no', 'hmm', 'lol'])
-
-        if selected_user != 'Overall':
-            df = df[df['user'] == selected_user]
-
-        # Filter messages
-        temp = df[
-            (~df['user'].isin(['group_notification', 'Notification'])) &
-            (~df['message'].str.contains('Media omitted|image omitted|video omitted',
-                                        case=False, na=False))
-        ]
-
-        words = []
-
-        for message in temp['message'].dropna():
-            # Clean message
-            message = re.sub(r'http\S+', '', message)
-            message = ''.join(char for char in message if char not in emoji.EMOJI_DATA)
-            message = re.sub(r'[^\w\s]', '', message)
-
-            # Split into words and filter
-            for word in message.lower().split():
-                if word not in stop_words and len(word) > 2:
-                    words.append(word)
-
-        # Count and return top N words
-        word_counts = Counter(words)
-        common_words = pd.DataFrame(word_counts.most_common(top_n))
+        word_matrix, users = word_view(selected_user, df)
+
+        # Row sum and partial sort of the precomputed user x word counts
+        common_words = pd.DataFrame(word_matrix.top(top_n, users))
 
         return common_words
 
@@ -190,38 +372,30 @@ def most_common_words(selected_user, df, top_n=20):
         print(f"Error in most_common_words: {e}")
         return pd.DataFrame()
 
+@profiling.timed('helper.emoji_helper', rows=selected_rows)
 def emoji_helper(selected_user, df):
     """
     Analyze emoji usage
     """
     try:
-        if selected_user != 'Overall':
-            df = df[df['user'] == selected_user]
+        if isinstance(df, ChatSummary):
+            emoji_counter = df.emoji_counter(selected_user)
+        else:
+            store, rows = text_view(selected_user, df)
 
-        emojis = []
+            # Whole emoji sequences, so skin tones, flags and ZWJ families count once
+            emoji_counter = Counter(store.emojis_for(rows))
 
-        for message in df['message'].dropna():
-            # Extract all emojis from message
-            emojis.extend([c for c in message if c in emoji.EMOJI_DATA])
-
-        if not emojis:
+        if not emoji_counter:
             return pd.DataFrame(columns=['Emoji', 'Count', 'Description'])
 
-        # Count emojis
-        emoji_counter = Counter(emojis)
-
         # Create DataFrame with emoji info
         emoji_list = []
         for emoji_char, count in emoji_counter.most_common():
-            try:
-                desc = emoji.demojize(emoji_char).replace(':', '').replace('_', ' ').title()
-            except:
-                desc = "Unknown Emoji"
-
             emoji_list.append({
                 'Emoji': emoji_char,
                 'Count': count,
-                'Description': desc
+                'Description': emojis.describe(emoji_char)
             })
 
         return pd.DataFrame(emoji_list)
@@ -230,24 +404,23 @@ def emoji_helper(selected_user, df):
         print(f"Error in emoji_helper: {e}")
         return pd.DataFrame()
 
+@profiling.timed('helper.monthly_timeline', rows=selected_rows)
 def monthly_timeline(selected_user, df):
     """
     Create monthly timeline of messages
     """
     try:
-        if selected_user != 'Overall':
-            df = df[df['user'] == selected_user]
+        cube, users = time_view(selected_user, df)
 
-        # Ensure date column is datetime
-        df['date'] = pd.to_datetime(df['date'], errors='coerce')
-        df = df.dropna(subset=['date'])
-
-        # Group by month and year
-        df['year_month'] = df['date'].dt.to_period('M')
-        timeline = df.groupby('year_month').size().reset_index(name='message')
+        counts = cube.monthly(users)
+        months = np.flatnonzero(counts)
 
         # Convert to string for display
-        timeline['time'] = timeline['year_month'].dt.strftime('%b %Y')
+        labels = (months + cube.first_month).astype('datetime64[M]')
+        timeline = pd.DataFrame({
+            'time': pd.DatetimeIndex(labels).strftime('%b %Y'),
+            'message': counts[months]
+        })
 
         return timeline[['time', 'message']]
 
@@ -255,21 +428,21 @@ def monthly_timeline(selected_user, df):
         print(f"Error in monthly_timeline: {e}")
         return pd.DataFrame()
 
+@profiling.timed('helper.daily_timeline', rows=selected_rows)
 def daily_timeline(selected_user, df):
     """
     Create daily timeline of messages
     """
     try:
-        if selected_user != 'Overall':
-            df = df[df['user'] == selected_user]
+        cube, users = time_view(selected_user, df)
 
-        # Ensure date column is datetime
-        df['date'] = pd.to_datetime(df['date'], errors='coerce')
-        df = df.dropna(subset=['date'])
+        counts = cube.daily(users)
+        days = np.flatnonzero(counts)
 
-        # Group by date
-        df['only_date'] = df['date'].dt.date
-        daily_timeline = df.groupby('only_date').size().reset_index(name='message')
+        daily_timeline = pd.DataFrame({
+            'only_date': cube.calendar[days].astype(object),
+            'message': counts[days]
+        })
 
         return daily_timeline
 
@@ -277,84 +450,149 @@ def daily_timeline(selected_user, df):
         print(f"Error in daily_timeline: {e}")
         return pd.DataFrame()
 
+@profiling.timed('helper.week_activity_map', rows=selected_rows)
 def week_activity_map(selected_user, df):
     """
     Map activity by day of week
     """
     try:
-        if selected_user != 'Overall':
-            df = df[df['user'] == selected_user]
-
-        # Ensure date column is datetime
-        df['date'] = pd.to_datetime(df['date'], errors='coerce')
-        df = df.dropna(subset=['date'])
+        cube, users = time_view(selected_user, df)
 
-        # Get day names in order
-        days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        df['day_name'] = pd.Categorical(df['date'].dt.day_name(), categories=days_order, ordered=True)
-
-        return df['day_name'].value_counts().sort_index()
+        return pd.Series(cube.weekdays(users), index=day_index(DAYS_ORDER), name='count')
 
     except Exception as e:
         print(f"Error in week_activity_map: {e}")
         return pd.Series()
 
+@profiling.timed('helper.month_activity_map', rows=selected_rows)
 def month_activity_map(selected_user, df):
     """
     Map activity by month
     """
     try:
-        if selected_user != 'Overall':
-            df = df[df['user'] == selected_user]
-
-        # Ensure date column is datetime
-        df['date'] = pd.to_datetime(df['date'], errors='coerce')
-        df = df.dropna(subset=['date'])
-
-        # Get month names in order
-        months_order = ['January', 'February', 'March', 'April', 'May', 'June',
-                       'July', 'August', 'September', 'October', 'November', 'December']
-        df['month'] = pd.Categorical(df['date'].dt.month_name(), categories=months_order, ordered=True)
+        cube, users = time_view(selected_user, df)
 
-        return df['month'].value_counts().sort_index()
+        return pd.Series(cube.months_of_year(users), index=month_index(MONTHS_ORDER), name='count')
 
     except Exception as e:
         print(f"Error in month_activity_map: {e}")
         return pd.Series()
 
+@profiling.timed('helper.activity_heatmap', rows=selected_rows)
 def activity_heatmap(selected_user, df):
     """
     Create activity heatmap (day vs time)
     """
     try:
-        if selected_user != 'Overall':
-            df = df[df['user'] == selected_user]
+        cube, users = time_view(selected_user, df)
 
-        # Ensure date column is datetime
-        df['date'] = pd.to_datetime(df['date'], errors='coerce')
-        df = df.dropna(subset=['date'])
+        grid = cube.week_hours(users)
 
-        # Create day and period columns
-        days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        df['day_name'] = pd.Categorical(df['date'].dt.day_name(), categories=days_order, ordered=True)
-
-        # Create time periods
-        df['hour'] = df['date'].dt.hour
-        df['period'] = df['hour'].apply(
-            lambda x: f"{x:02d}:00"
-        )
+        # Only days and hours with activity, like a pivot table of observed values
+        days = np.flatnonzero(grid.sum(axis=1))
+        hours = np.flatnonzero(grid.sum(axis=0))
 
-        # Create pivot table
-        heatmap_data = df.pivot_table(
-            index='day_name',
-            columns='period',
-            values='message',
-            aggfunc='count',
-            fill_value=0
+        heatmap_data = pd.DataFrame(
+            grid[np.ix_(days, hours)],
+            index=day_index([DAYS_ORDER[day] for day in days]),
+            columns=pd.Index([f"{hour:02d}:00" for hour in hours], name='period')
         )
 
         return heatmap_data
 
     except Exception as e:
         print(f"Error in activity_heatmap: {e}")
-        return pd.DataFrame()
\ No newline at end of file
+        return pd.DataFrame()
+
+# Report sections and the helper computing each from a shared ChatIndex
+REPORT_SECTIONS = {
+    'stats': fetch_stats,
+    'distinct': distinct_counts,
+    'top_domains': top_domains,
+    'monthly_timeline': monthly_timeline,
+    'daily_timeline': daily_timeline,
+    'week_activity': week_activity_map,
+    'month_activity': month_activity_map,
+    'heatmap': activity_heatmap,
+    'busy_users': lambda selected_user, index: most_busy_users(index),
+    'wordcloud': create_wordcloud,
+    'common_words': most_common_words,
+    'emojis': emoji_helper,
+}
+
+
+class AnalysisReport:
+    """
+    Read-only results of every dashboard metric for one user
+
+    All sections share one ChatIndex, so the user's row positions, token
+    store and time cube are resolved once. With lazy=True a section is only
+    computed the first time its attribute is read. Sections of a keyed
+    index are memoized per (chat, user, ANALYSIS_VERSION).
+    """
+
+    def __init__(self, index, selected_user, lazy=False):
+        object.__setattr__(self, 'index', index)
+        object.__setattr__(self, 'selected_user', selected_user)
+        object.__setattr__(self, '_values', {})
+        if not lazy:
+            for section in REPORT_SECTIONS:
+                getattr(self, section)
+
+    def __getattr__(self, name):
+        compute = REPORT_SECTIONS.get(name)
+        if compute is None:
+            raise AttributeError(name)
+        values = self.__dict__['_values']
+        if name not in values:
+            if self.index.key is None:
+                values[name] = compute(self.selected_user, self.index)
+            else:
+                # Approximate summaries of a chat are keyed by their error bound
+                values[name] = cache.memory.get_or_compute(
+                    ('report', self.index.key, getattr(self.index, 'error', None),
+                     self.selected_user, ANALYSIS_VERSION, name),
+                    lambda: self._compute(compute))
+        return values[name]
+
+    def _compute(self, compute):
+        # A section may build the index's token store or time cube, which its cache entry must count
+        value = compute(self.selected_user, self.index)
+        index = self.index
+        if isinstance(index, ChatIndex):
+            # Components may also have been installed by the scheduler; compare with the last sizing
+            components = index.components
+            if components != index.__dict__.get('_sized'):
+                index._sized = components
+                cache.memory.resize(('index', index.key))
+        return value
+
+    def __setattr__(self, name, value):
+        raise AttributeError("AnalysisReport is read-only")
+
+    def __delattr__(self, name):
+        raise AttributeError("AnalysisReport is read-only")
+
+    @property
+    def approximate(self):
+        """
+        Whether word, emoji and distinct counts are sketch estimates
+        """
+        return getattr(self.index, 'approximate', False)
+
+    @property
+    def computed(self):
+        """
+        Names of the sections computed so far
+        """
+        return list(self._values)
+
+
+def analyze(df, selected_user, lazy=False, key=None):
+    """
+    Compute every metric for selected_user in one AnalysisReport
+
+    df may be a DataFrame, a ChatIndex, or a ChatSummary from summary.summarize.
+    """
+    index = df if isinstance(df, (ChatIndex, ChatSummary)) else ChatIndex(df, key=key)
+    return AnalysisReport(index, selected_user, lazy=lazy)
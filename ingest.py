@@ -0,0 +1,140 @@
+import codecs
+import io
+import os
+import zipfile
+
+# Bytes read from the source per decoding step
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# Bytes inspected when sniffing the encoding
+SNIFF_BYTES = 64 * 1024
+
+ZIP_MAGIC = b'PK\x03\x04'
+
+
+def sniff_encoding(head):
+    """
+    Guess the text encoding from the first bytes of an export
+    """
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+
+    # A multi-byte character may be cut at the end of the sample, so decode incrementally
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'latin-1'
+
+
+def _chat_member(archive):
+    """
+    Pick the chat text file inside a WhatsApp .zip export
+    """
+    names = [name for name in archive.namelist() if name.lower().endswith('.txt')]
+    for name in names:
+        if os.path.basename(name) == '_chat.txt':
+            return name
+    if not names:
+        raise ValueError("No chat .txt file found in the zip archive")
+    return names[0]
+
+
+def _iter_bytes(stream, chunk_size):
+    """
+    Yield raw byte chunks from a binary stream, opening the chat inside zip archives
+    """
+    head = stream.read(len(ZIP_MAGIC))
+
+    if head == ZIP_MAGIC:
+        if stream.seekable():
+            stream.seek(0)
+        else:
+            stream = io.BytesIO(head + stream.read())
+        with zipfile.ZipFile(stream) as archive:
+            with archive.open(_chat_member(archive)) as member:
+                while True:
+                    chunk = member.read(chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+        return
+
+    if head:
+        yield head
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def _open(source):
+    """
+    Binary stream for a path, bytes, or file-like object, and whether the caller must close it
+    """
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, 'rb'), True
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source), False
+    return source, False
+
+
+def iter_bytes(source, chunk_size=CHUNK_SIZE):
+    """
+    Stream the undecoded chat text from a path, bytes, or binary file-like object
+    """
+    source, owned = _open(source)
+    try:
+        if hasattr(source, 'seekable') and source.seekable():
+            source.seek(0)
+        yield from _iter_bytes(source, chunk_size)
+    finally:
+        if owned:
+            source.close()
+
+
+def iter_text(source, chunk_size=CHUNK_SIZE):
+    """
+    Stream decoded text chunks from a path, bytes, or file-like object
+    """
+    source, owned = _open(source)
+
+    try:
+        if isinstance(source, io.TextIOBase):
+            # Already decoded
+            while True:
+                text = source.read(chunk_size)
+                if not text:
+                    break
+                yield text
+            return
+
+        if hasattr(source, 'seekable') and source.seekable():
+            source.seek(0)
+
+        decoder = None
+        pending = b''
+        for chunk in _iter_bytes(source, chunk_size):
+            if decoder is None:
+                # Sniff the encoding once enough bytes are buffered
+                pending += chunk
+                if len(pending) < SNIFF_BYTES:
+                    continue
+                chunk, pending = pending, b''
+                decoder = codecs.getincrementaldecoder(sniff_encoding(chunk))(errors='replace')
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+
+        if decoder is None:
+            decoder = codecs.getincrementaldecoder(sniff_encoding(pending))(errors='replace')
+        text = decoder.decode(pending, final=True)
+        if text:
+            yield text
+
+    finally:
+        if owned:
+            source.close()
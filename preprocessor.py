@@ -1,125 +1,603 @@
+import itertools
+import multiprocessing
+import os
 import re
+from collections import namedtuple
+from enum import IntEnum
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
 from datetime import datetime
+import ingest
+import profiling
 import warnings
 warnings.filterwarnings('ignore')
 
-def preprocess(data):
+# Bump whenever the preprocessed output changes so cached results are invalidated
+PARSER_VERSION = 4
+
+# One WhatsApp export layout: a header regex capturing the timestamp and the
+# explicit strftime format used to convert every captured timestamp at once
+ChatFormat = namedtuple('ChatFormat', ['name', 'label', 'header', 'date_format'])
+
+# Two-hour activity periods indexed by hour // 2
+PERIOD_LABELS = np.array([
+    "00-02", "02-04", "04-06", "06-08", "08-10", "10-12",
+    "12-14", "14-16", "16-18", "18-20", "20-22", "22-24"
+], dtype=object)
+
+DAYS_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+MONTHS_ORDER = ['January', 'February', 'March', 'April', 'May', 'June',
+                'July', 'August', 'September', 'October', 'November', 'December']
+
+# Dtypes of the compact schema; user categories are taken from the data
+COMPACT_DTYPES = {
+    'day_name': pd.CategoricalDtype(DAYS_ORDER, ordered=True),
+    'month': pd.CategoricalDtype(MONTHS_ORDER, ordered=True),
+    'period': pd.CategoricalDtype(list(PERIOD_LABELS), ordered=True),
+    'year': 'int16',
+    'month_num': 'int8',
+    'day': 'int8',
+    'hour': 'int8',
+    'minute': 'int8',
+}
+
+
+# Columns and dtypes parse_messages returns
+MESSAGE_SCHEMA = {
+    'date': 'datetime64[us]',
+    'user': 'str',
+    'message': 'str',
+    'message_kind': 'int8',
+    'only_date': object,
+    'year': 'int32',
+    'month_num': 'int32',
+    'month': 'str',
+    'day': 'int32',
+    'day_name': 'str',
+    'hour': 'int32',
+    'minute': 'int32',
+    'period': 'str',
+}
+
+
+class MessageKind(IntEnum):
+    """
+    Values of the message_kind column
+    """
+    TEXT = 0
+    MEDIA = 1
+    DELETED = 2
+    SYSTEM = 3
+    CALL = 4
+    POLL = 5
+
+
+# Whole-message placeholders WhatsApp writes in place of content, per export language
+MESSAGE_KIND_PATTERNS = {
+    MessageKind.MEDIA: [
+        r'<Media omitted>', r'(?:image|video|audio|document|sticker|GIF|Contact card) omitted',
+        r'<Multimedia omitido>', r'<Mídia oculta>', r'<Medien ausgeschlossen>',
+        r'<Médias omis>', r'<Media omessi>', r'<Media tidak disertakan>',
+        r'\S+\.\w+ \(file attached\)',
+    ],
+    MessageKind.DELETED: [
+        r'This message was deleted\.?', r'You deleted this message\.?',
+        r'Se eliminó este mensaje\.?', r'Eliminaste este mensaje\.?',
+        r'Mensagem apagada', r'Essa mensagem foi apagada',
+        r'Diese Nachricht wurde gelöscht\.?', r'Du hast diese Nachricht gelöscht\.?',
+        r'Ce message a été supprimé\.?', r'Vous avez supprimé ce message\.?',
+        r'Questo messaggio è stato eliminato\.?', r'Pesan ini telah dihapus',
+        r'यह मैसेज हटा दिया गया था',
+    ],
+    MessageKind.CALL: [
+        r'Missed (?:voice|video|group voice|group video) call', r'(?:Voice|Video|Group voice|Group video) call',
+        r'Llamada (?:de (?:voz|video) )?perdida', r'Llamada de (?:voz|video)',
+        r'Chamada (?:de (?:voz|vídeo) )?perdida', r'Chamada de (?:voz|vídeo)',
+        r'(?:Verpasster )?(?:Sprach|Video)anruf', r'Appel (?:vocal|vidéo)(?: manqué)?', r'Appel manqué',
+    ],
+    # Continuation lines are joined with spaces, so the options follow the question
+    MessageKind.POLL: [
+        r'POLL: .+?(?: OPTION: .+? \(\d+ votes?\))+', r'ENCUESTA: .+?(?: OPCIÓN: .+? \(\d+ votos?\))+',
+        r'ENQUETE: .+?(?: OPÇÃO: .+? \(\d+ votos?\))+', r'UMFRAGE: .+?(?: OPTION: .+? \(\d+ Stimmen?\))+',
+        r'SONDAGE: .+?(?: OPTION: .+? \(\d+ votes?\))+', r'SONDAGGIO: .+?(?: OPZIONE: .+? \(\d+ vot[io]\))+',
+    ],
+}
+
+# What may follow a placeholder: a caption after media; the duration or a callback note after a call
+MESSAGE_KIND_SUFFIXES = {
+    MessageKind.MEDIA: r'.*',
+    MessageKind.CALL: r'(?:, \u200e?(?:\d+ (?:sec|min|hr|seg|h|s|Sek\.|Min\.|Std\.)|Tap to call back|'
+                      r'Click to call back|No answer))?',
+}
+
+# One alternation with a named group per kind, so classification is a single pass.
+# Matching is case-sensitive: placeholders use WhatsApp's exact wording, which users rarely type
+MESSAGE_KIND_RE = re.compile(
+    r'^[\u200e\u200f]*(?:' + '|'.join(
+        f"(?P<{kind.name.lower()}>(?:{'|'.join(patterns)}){MESSAGE_KIND_SUFFIXES.get(kind, '')})"
+        for kind, patterns in MESSAGE_KIND_PATTERNS.items()
+    ) + r')\s*$'
+)
+
+
+def classify_messages(users, messages):
+    """
+    message_kind codes for each message in one vectorized pass
+    """
+    groups = pd.Series(messages, dtype=object).str.extract(MESSAGE_KIND_RE)
+    kinds = np.full(len(groups), MessageKind.TEXT, dtype=np.int8)
+    for kind in MESSAGE_KIND_PATTERNS:
+        kinds[groups[kind.name.lower()].notna().to_numpy()] = kind
+    kinds[np.asarray(users == 'group_notification')] = MessageKind.SYSTEM
+    return kinds
+
+
+def message_kinds(df):
+    """
+    The message_kind column, classified on the fly for frames that predate it
+    """
+    if 'message_kind' in df:
+        return df['message_kind'].to_numpy()
+    return classify_messages(df['user'], df['message'])
+
+
+def factorize_users(users):
+    """
+    (code of each row, users in order of first appearance) of a user column
+
+    A categorical column is grouped on its integer codes and mapped back
+    through its categories, instead of being converted to strings.
+    """
+    if isinstance(users.dtype, pd.CategoricalDtype):
+        codes, used = pd.factorize(users.cat.codes.to_numpy())
+        return codes, np.asarray(users.cat.categories[used], dtype=object)
+    codes, uniques = pd.factorize(users)
+    return codes, np.asarray(uniques, dtype=object)
+
+
+# Number of leading lines inspected when sniffing the export format
+SAMPLE_LINES = 500
+
+# Inputs shorter than this (in characters) are always parsed serially
+PARALLEL_MIN_CHARS = 16 * 1024 * 1024
+
+# Processes one upload is parsed with; each upload starts its own pool, so this stays well below the core count
+PARSE_WORKERS = int(os.environ.get('WHATSAPP_ANALYZER_PARSE_WORKERS', min(4, os.cpu_count() or 1)))
+
+
+def _build_registry():
+    """
+    Build the registry of supported export formats
+    """
+    registry = []
+    for family in ('android', 'ios'):
+        for clock in ('24h', '12h'):
+            for order in ('dmy', 'mdy'):
+                for year in ('yyyy', 'yy'):
+                    year_re, year_fmt = (r'\d{4}', '%Y') if year == 'yyyy' else (r'\d{2}', '%y')
+                    day_month = '%d/%m' if order == 'dmy' else '%m/%d'
+                    time_re, time_fmt = r'\d{1,2}:\d{2}', ('%H:%M' if clock == '24h' else '%I:%M')
+                    if family == 'ios':
+                        time_re, time_fmt = time_re + r':\d{2}', time_fmt + ':%S'
+                    if clock == '12h':
+                        # Covers "9:41 pm", "9:41PM", "9:41\u202fp.m."
+                        time_re, time_fmt = time_re + r'\s?[APap]\.?[Mm]\.?', time_fmt + ' %p'
+
+                    stamp = r'(\d{1,2}/\d{1,2}/' + year_re + r',\s' + time_re + ')'
+                    # Attachment lines may start with a direction mark, as the placeholders do
+                    if family == 'android':
+                        header = r'^[\u200e\u200f]*' + stamp + r'\s*-\s*'
+                    else:
+                        header = r'^[\u200e\u200f]*\[' + stamp + r'\]\s*'
+
+                    registry.append(ChatFormat(
+                        name=f"{family}_{clock}_{order}_{year}",
+                        label=f"{'Android' if family == 'android' else 'iOS'} {clock} "
+                              f"{'DD/MM' if order == 'dmy' else 'MM/DD'}/{year.upper()}",
+                        header=re.compile(header, re.MULTILINE),
+                        date_format=f"{day_month}/{year_fmt}, {time_fmt}"
+                    ))
+    return registry
+
+
+FORMATS = _build_registry()
+FORMATS_BY_NAME = {chat_format.name: chat_format for chat_format in FORMATS}
+
+# Leading fields of a timestamp, which are the day and month in either order
+DAY_MONTH_RE = re.compile(r'^(\d{1,2})/(\d{1,2})/')
+
+# Share of unparseable timestamps above which a chat cannot be in the detected format
+MAX_UNPARSED_SHARE = 0.05
+
+
+def date_order(chat_format):
+    """
+    'dmy' or 'mdy', the order of the day and month in a format's timestamps
+    """
+    return 'dmy' if '_dmy_' in chat_format.name else 'mdy'
+
+
+def with_order(chat_format, order):
+    """
+    The format with the same layout whose timestamps have the given day/month order
+    """
+    return FORMATS_BY_NAME[chat_format.name.replace(f'_{date_order(chat_format)}_', f'_{order}_')]
+
+
+def resolve_order(text, chat_format):
+    """
+    'dmy' or 'mdy' if some timestamp in text can only be read one way, else None
+
+    A first field over 12 can only be a day, a second field over 12 only a
+    day of a month-first stamp. Only the header regex runs over the text.
+    """
+    stamps = chat_format.header.findall(text)
+    if not stamps:
+        return None
+    fields = pd.Series(stamps, dtype=object).str.extract(DAY_MONTH_RE).astype(np.int16)
+    day_first, month_first = bool((fields[0] > 12).any()), bool((fields[1] > 12).any())
+    if day_first == month_first:
+        # Neither, or contradictory stamps the parser will reject either way
+        return None
+    return 'dmy' if day_first else 'mdy'
+
+
+def normalize_dates(dates, chat_format):
+    """
+    Normalize captured timestamps so they match the format's strftime pattern
+    """
+    dates = dates.str.replace('\u202f', ' ', regex=False).str.replace('\u00a0', ' ', regex=False)
+    if '%p' in chat_format.date_format:
+        # "9:41PM" / "9:41 p.m." -> "9:41 PM"
+        dates = dates.str.replace(r'\s*([AaPp])\.?\s*([Mm])\.?$', r' \1\2', regex=True)
+    return dates
+
+
+def parse_dates(dates, chat_format):
+    """
+    Convert timestamp strings with one vectorized call using the format's explicit pattern
+    """
+    return pd.to_datetime(normalize_dates(dates, chat_format),
+                          format=chat_format.date_format, errors='coerce')
+
+
+def detect_format(data, sample_lines=SAMPLE_LINES):
+    """
+    Sniff the export format from the first lines of the chat
+    """
+    end = -1
+    for _ in range(sample_lines):
+        end = data.find('\n', end + 1)
+        if end == -1:
+            break
+    sample = data[:end] if end != -1 else data
+
+    # Formats whose header matches the most sample lines
+    best, candidates = 0, []
+    for chat_format in FORMATS:
+        stamps = chat_format.header.findall(sample)
+        if len(stamps) > best:
+            best, candidates = len(stamps), [(chat_format, stamps)]
+        elif stamps and len(stamps) == best:
+            candidates.append((chat_format, stamps))
+
+    if not candidates:
+        return None
+
+    # Day-first and month-first share a header; keep the ones that parse the whole sample
+    parsed = [(chat_format, parse_dates(pd.Series(stamps, dtype=object), chat_format))
+              for chat_format, stamps in candidates]
+    fewest_errors = min(dates.isna().sum() for _, dates in parsed)
+    parsed = [(f, dates) for f, dates in parsed if dates.isna().sum() == fewest_errors]
+
+    if len(parsed) > 1:
+        # No day > 12 in the sample: any timestamp in the rest of the input may settle it
+        order = resolve_order(data, parsed[0][0])
+        if order is not None:
+            parsed = [item for item in parsed if date_order(item[0]) == order] or parsed
+
+    if len(parsed) > 1:
+        # Still ambiguous: chats are chronological, so pick the interpretation with the
+        # fewest backwards jumps, then month-first as pandas' mixed-format parsing did
+        parsed.sort(key=lambda item: ((item[1].diff().dt.total_seconds() < 0).sum(),
+                                      date_order(item[0]) != 'mdy'))
+
+    return parsed[0][0]
+
+
+def split_messages(data, chat_format):
+    """
+    Split raw chat text into one row per message using a single regex pass
+    """
+    # re.split with one capture group yields [preamble, date, body, date, body, ...]
+    parts = chat_format.header.split(data.strip())
+    if len(parts) < 3:
+        return pd.DataFrame({'raw_message': [], 'date_string': []}, dtype=object)
+
+    # Continuation lines are joined onto their header line with single spaces
+    bodies = pd.Series(parts[2::2], dtype=object).str.replace(r'\s*\n\s*', ' ', regex=True)
+
+    return pd.DataFrame({
+        'raw_message': bodies.to_numpy(),
+        'date_string': parts[1::2]
+    })
+
+
+def parse_messages(text, chat_format):
+    """
+    Parse chat text in a known format into the preprocessed DataFrame schema
+    """
+    df = split_messages(text, chat_format)
+
+    # Parse dates
+    df['date'] = parse_dates(df['date_string'], chat_format)
+
+    # A wrong day/month order turns every stamp dated after the 12th into NaT
+    unparsed = int(df['date'].isna().sum())
+    if unparsed > MAX_UNPARSED_SHARE * len(df):
+        raise ValueError(f"{unparsed:,} of {len(df):,} timestamps do not match "
+                         f"the detected {chat_format.label} format")
+
+    # Drop rows where date couldn't be parsed
+    df = df.dropna(subset=['date'])
+
+    if df.empty:
+        # Splitting no rows yields no columns; a block without messages keeps the schema
+        empty = pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in MESSAGE_SCHEMA.items()})
+        empty.attrs['chat_format'] = chat_format.name
+        empty.attrs['chat_format_label'] = chat_format.label
+        return empty
+
+    # Extract user and message: "user: message", anything else is a notification
+    parts = df['raw_message'].str.split(': ', n=1, expand=True)
+    if parts.shape[1] < 2:
+        parts[1] = None
+    has_user = parts[1].notna()
+    df['user'] = parts[0].str.strip().str.replace('[\u202c\u200e]', '', regex=True).where(
+        has_user, 'group_notification')
+    df['message'] = parts[1].where(has_user, df['raw_message']).str.strip()
+
+    # Remove rows with empty messages
+    df = df[df['message'] != '']
+
+    # Classify text, media, deleted, system, call and poll messages once
+    df['message_kind'] = classify_messages(df['user'], df['message'])
+
+    # Create datetime features
+    df['only_date'] = df['date'].dt.date
+    df['year'] = df['date'].dt.year
+    df['month_num'] = df['date'].dt.month
+    df['month'] = df['date'].dt.month_name()
+    df['day'] = df['date'].dt.day
+    df['day_name'] = df['date'].dt.day_name()
+    df['hour'] = df['date'].dt.hour
+    df['minute'] = df['date'].dt.minute
+
+    # Create time periods
+    df['period'] = PERIOD_LABELS[df['hour'].to_numpy() // 2]
+
+    # Drop unnecessary columns
+    df = df.drop(['raw_message', 'date_string'], axis=1)
+
+    # Report the detected layout to the caller
+    df.attrs['chat_format'] = chat_format.name
+    df.attrs['chat_format_label'] = chat_format.label
+
+    return df
+
+
+def compact_schema(df):
+    """
+    Convert a preprocessed DataFrame to the compact schema
+
+    Repeated strings become categoricals, small integers use int8/int16 and
+    only_date is stored as datetime64 instead of Python date objects.
+    """
+    compact = df.astype(COMPACT_DTYPES)
+    compact['user'] = compact['user'].astype('category')
+    compact['only_date'] = compact['date'].dt.normalize()
+    compact.attrs = dict(df.attrs)
+    return compact
+
+
+def memory_report(df):
+    """
+    Bytes per column of the standard schema versus the compact schema
+    """
+    before = df.memory_usage(deep=True, index=False)
+    after = compact_schema(df).memory_usage(deep=True, index=False)
+
+    report = pd.DataFrame({'Column': before.index, 'Before': before.values, 'After': after.values})
+    report.loc[len(report)] = ['Total', before.sum(), after.sum()]
+    report['Saved %'] = (100 * (1 - report['After'] / report['Before'])).round(1)
+
+    return report
+
+
+def _last_message_start(buffer, chat_format):
+    """
+    Offset of the last message header in buffer, or 0 if there is none after the start
+    """
+    end = len(buffer)
+    while True:
+        newline = buffer.rfind('\n', 0, end)
+        if newline == -1:
+            return 0
+        if chat_format.header.match(buffer, newline + 1):
+            return newline + 1
+        end = newline
+
+
+def _iter_source_text(source, chunk_size):
+    """
+    Yield text chunks from chat text already in memory or from a streamed source
+    """
+    if isinstance(source, str) and not is_path(source):
+        for start in range(0, len(source), chunk_size):
+            yield source[start:start + chunk_size]
+    else:
+        yield from ingest.iter_text(source, chunk_size)
+
+
+def iter_blocks(source, chunk_size=ingest.CHUNK_SIZE):
+    """
+    Yield (text, chat_format) blocks of roughly chunk_size that each start at a message header
+
+    Continuation lines always stay in the same block as their header, so the
+    blocks can be parsed independently and concatenated in order. While no
+    timestamp has shown whether the day or the month comes first, blocks are
+    held back (usually less than a month of messages) and all yielded in the
+    order that settles it.
+    """
+    chat_format = None
+    undecided = False
+    pending = []
+    buffer = ''
+
+    for text in _iter_source_text(source, chunk_size):
+        buffer += text
+
+        if chat_format is None:
+            # The first chunk holds at least ingest.SNIFF_BYTES, plenty for the sample
+            chat_format = detect_format(buffer)
+            if chat_format is None:
+                raise ValueError("No valid messages found in the file")
+            undecided = resolve_order(buffer, chat_format) is None
+
+        # The last message may continue in the next chunk
+        start = _last_message_start(buffer, chat_format)
+        if start == 0:
+            continue
+        block, buffer = buffer[:start], buffer[start:]
+        if not undecided:
+            yield block, chat_format
+            continue
+
+        pending.append(block)
+        order = resolve_order(block, chat_format)
+        if order is not None:
+            chat_format, undecided = with_order(chat_format, order), False
+            for block in pending:
+                yield block, chat_format
+            pending = []
+
+    if chat_format is None:
+        chat_format = detect_format(buffer)
+        if chat_format is None:
+            raise ValueError("No valid messages found in the file")
+    elif undecided:
+        # Otherwise the order detect_format preferred stands
+        order = resolve_order(buffer, chat_format)
+        if order is not None:
+            chat_format = with_order(chat_format, order)
+    for block in pending:
+        yield block, chat_format
+    if buffer.strip():
+        yield buffer, chat_format
+
+
+def iter_chunks(source, chunk_size=ingest.CHUNK_SIZE):
+    """
+    Stream a chat export and yield parsed messages as DataFrame chunks
+    """
+    for block, chat_format in iter_blocks(source, chunk_size):
+        yield parse_messages(block, chat_format)
+
+
+def _parse_block(args):
+    """
+    Process pool entry point: parse one header-aligned block
+    """
+    block, format_name = args
+    return parse_messages(block, FORMATS_BY_NAME[format_name])
+
+
+def parse_parallel(source, workers, chunk_size=ingest.CHUNK_SIZE):
+    """
+    Parse header-aligned blocks of an export in a process pool, keeping message order
+    """
+    blocks = ((block, chat_format.name) for block, chat_format in iter_blocks(source, chunk_size))
+
+    first = next(blocks, None)
+    if first is None:
+        return []
+    second = next(blocks, None)
+    if second is None:
+        # A single block is not worth starting a pool for
+        return [_parse_block(first)]
+
+    # Spawned workers are safe to start from threaded servers such as Streamlit
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        return list(pool.map(_parse_block, itertools.chain([first, second], blocks)))
+
+
+def is_path(data):
+    """
+    Whether a string argument names a file rather than holding chat text
+    """
+    return '\n' not in data and len(data) < 4096 and os.path.isfile(data)
+
+
+def _input_size(data):
+    """
+    Best-effort size of the input, used to decide whether parallel parsing pays off
+    """
+    if isinstance(data, (str, bytes, bytearray)) and not (isinstance(data, str) and is_path(data)):
+        return len(data)
+    if isinstance(data, (str, os.PathLike)):
+        return os.path.getsize(data)
+    size = getattr(data, 'size', None)
+    if size is None and hasattr(data, 'getbuffer'):
+        size = data.getbuffer().nbytes
+    return size or 0
+
+
+@profiling.timed('preprocess', rows=profiling.frame_rows)
+def preprocess(data, workers=1, compact=False):
     """
     Preprocess WhatsApp chat data
+
+    data may be the chat text, a path to a .txt/.zip export, raw bytes,
+    or a binary file-like object such as a Streamlit upload. With workers > 1,
+    large inputs are parsed in a process pool; the result is identical.
+    compact=True returns the categorical/small-integer schema (see compact_schema).
     """
     try:
-        # Handle different WhatsApp formats
-        # Common pattern for most WhatsApp exports
-        pattern = r'(\d{1,2}/\d{1,2}/\d{2,4},\s\d{1,2}:\d{2}\s?[APapMm]*)\s*-\s*(.*)'
-
-        lines = data.strip().split('\n')
-        messages = []
-        dates = []
-
-        for line in lines:
-            if not line.strip():
-                continue
-
-            match = re.match(pattern, line)
-            if match:
-                dates.append(match.group(1))
-                messages.append(match.group(2))
-            else:
-                # If line doesn't match pattern, append to last message
-                if messages:
-                    messages[-1] += ' ' + line.strip()
-
-        if not messages:
-            # Try alternative pattern
-            pattern2 = r'\[(\d{1,2}/\d{1,2}/\d{2,4},\s\d{1,2}:\d{2}:\d{2})\]\s*(.*)'
-            for line in lines:
-                match = re.match(pattern2, line)
-                if match:
-                    dates.append(match.group(1))
-                    messages.append(match.group(2))
-                elif messages:
-                    messages[-1] += ' ' + line.strip()
-
-        if not messages:
+        size = _input_size(data)
+        if workers > 1 and size >= PARALLEL_MIN_CHARS:
+            # Blocks of about a quarter of each worker's share keep the pool busy
+            chunks = parse_parallel(data, workers, max(ingest.CHUNK_SIZE, size // (workers * 4) + 1))
+        elif isinstance(data, str) and not is_path(data):
+            chat_format = detect_format(data)
+            if chat_format is None:
+                raise ValueError("No valid messages found in the file")
+            chunks = [parse_messages(data, chat_format)]
+        else:
+            chunks = list(iter_chunks(data))
+
+        # Blocks without a single message add nothing
+        chunks = [chunk for chunk in chunks if not chunk.empty]
+        if not chunks:
             raise ValueError("No valid messages found in the file")
 
-        # Create DataFrame
-        df = pd.DataFrame({
-            'raw_message': messages,
-            'date_string': dates
-        })
-
-        # Clean date strings - FIXED: Use raw string for regex
-        df['date_string'] = df['date_string'].str.replace(r'[\[\]]', '', regex=True)
-        df['date_string'] = df['date_string'].str.replace('\u202f', ' ', regex=False)
-
-        # Parse dates
-        df['date'] = pd.to_datetime(df['date_string'], format='mixed', errors='coerce')
-
-        # Drop rows where date couldn't be parsed
-        df = df.dropna(subset=['date'])
-
-        # Extract user and message
-        def extract_user_message(text):
-            if not isinstance(text, str):
-                return 'group_notification', ''
-
-            # Common patterns
-            if ': ' in text:
-                parts = text.split(': ', 1)
-                if len(parts) == 2:
-                    user = parts[0].strip()
-                    # Clean user name
-                    user = re.sub(r'[\u202c\u200e]', '', user)
-                    message = parts[1].strip()
-                    return user, message
-
-            return 'group_notification', text.strip()
-
-        # Apply extraction
-        extracted = df['raw_message'].apply(extract_user_message)
-        df['user'] = extracted.apply(lambda x: x[0])
-        df['message'] = extracted.apply(lambda x: x[1])
-
-        # Remove rows with empty messages
-        df = df[df['message'].str.strip() != '']
-
-        # Create datetime features
-        df['only_date'] = df['date'].dt.date
-        df['year'] = df['date'].dt.year
-        df['month_num'] = df['date'].dt.month
-        df['month'] = df['date'].dt.month_name()
-        df['day'] = df['date'].dt.day
-        df['day_name'] = df['date'].dt.day_name()
-        df['hour'] = df['date'].dt.hour
-        df['minute'] = df['date'].dt.minute
-
-        # Create time periods
-        def get_period(hour):
-            periods = [
-                (0, 2, "00-02"), (2, 4, "02-04"), (4, 6, "04-06"),
-                (6, 8, "06-08"), (8, 10, "08-10"), (10, 12, "10-12"),
-                (12, 14, "12-14"), (14, 16, "14-16"), (16, 18, "16-18"),
-                (18, 20, "18-20"), (20, 22, "20-22"), (22, 24, "22-24")
-            ]
-            for start, end, label in periods:
-                if start <= hour < end:
-                    return label
-            return "22-24"
-
-        df['period'] = df['hour'].apply(get_period)
-
-        # Drop unnecessary columns
-        df = df.drop(['raw_message', 'date_string'], axis=1)
+        df = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+        df.attrs = dict(chunks[0].attrs)
+
+        if df.empty:
+            raise ValueError("No valid messages found in the file")
 
         # Reset index
         df = df.reset_index(drop=True)
 
+        if compact:
+            df = compact_schema(df)
+
         return df
 
     except Exception as e:
         print(f"Error in preprocessing: {e}")
         import traceback
         traceback.print_exc()
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,200 @@
+import contextvars
+import cProfile
+import functools
+import json
+import logging
+import marshal
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+import pandas as pd
+
+# Stage records are logged here as one JSON object per line
+logger = logging.getLogger('whatsapp_analyzer.performance')
+
+# '-' logs to stderr, anything else is a file path; unset leaves logging to the host application
+PERF_LOG = os.environ.get('WHATSAPP_ANALYZER_PERF_LOG')
+
+if PERF_LOG:
+    handler = logging.StreamHandler(sys.stderr) if PERF_LOG == '-' else logging.FileHandler(PERF_LOG, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+# The run stages are recorded into, per thread (each Streamlit session runs its script in its own)
+_current = contextvars.ContextVar('profiling_run', default=None)
+
+# tracemalloc is process-wide: it runs while any Run traces memory, stopped by the last one
+_tracing_lock = threading.Lock()
+_tracing_runs = 0
+_started_tracing = False
+
+
+def _trace(start):
+    global _tracing_runs, _started_tracing
+    with _tracing_lock:
+        if start:
+            if _tracing_runs == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _started_tracing = True
+            _tracing_runs += 1
+        else:
+            _tracing_runs -= 1
+            if _tracing_runs == 0 and _started_tracing:
+                tracemalloc.stop()
+                _started_tracing = False
+
+
+class Run:
+    """
+    Stages recorded while one analysis runs, e.g. one Streamlit script run
+
+    With memory=True tracemalloc is started so every stage reports its peak
+    allocation (Python allocations only, slower while tracing, and blurred
+    when several sessions run at once since tracing is process-wide). With
+    profile=True the run is also recorded by cProfile; see profile_bytes.
+    """
+
+    def __init__(self, memory=False, profile=False):
+        self.stages = []
+        self.started = time.perf_counter()
+        self.memory = memory
+        if memory:
+            _trace(True)
+        # Per thread: [traced memory at entry, highest peak seen] of every open stage, innermost last
+        self._local = threading.local()
+        self.profile = None
+        if profile:
+            self.profile = cProfile.Profile()
+            try:
+                self.profile.enable()
+            except ValueError:
+                # Another profiler is already active in this thread
+                self.profile = None
+        _current.set(self)
+
+    @property
+    def _open(self):
+        if not hasattr(self._local, 'open'):
+            self._local.open = []
+        return self._local.open
+
+    def finish(self):
+        """
+        Stop recording; returns the run
+        """
+        if self.profile is not None:
+            self.profile.disable()
+        if self.memory:
+            _trace(False)
+            self.memory = False
+        if _current.get() is self:
+            _current.set(None)
+        self.seconds = time.perf_counter() - self.started
+        return self
+
+    def table(self):
+        """
+        Recorded stages as a DataFrame, in the order they finished
+        """
+        columns = ['stage', 'seconds', 'rows', 'peak_mb', 'depth']
+        if not self.stages:
+            return pd.DataFrame(columns=columns)
+        table = pd.DataFrame(self.stages)
+        table['peak_mb'] = table['peak_bytes'] / 2 ** 20
+        return table[columns]
+
+    def profile_bytes(self):
+        """
+        The cProfile stats in pstats format (snakeviz, gprof2dot and flameprof read it), or None
+        """
+        if self.profile is None:
+            return None
+        self.profile.create_stats()
+        return marshal.dumps(self.profile.stats)
+
+    def dump_profile(self, path):
+        if self.profile is not None:
+            self.profile.dump_stats(path)
+        return path
+
+
+def start_run(memory=False, profile=False):
+    """
+    Record the stages of everything run next in this thread into a new Run
+    """
+    return Run(memory=memory, profile=profile)
+
+
+def current_run():
+    return _current.get()
+
+
+@contextmanager
+def stage(name, rows=None):
+    """
+    Time the block as a stage of the current run and log it
+
+    Yields the stage record, so rows can be set once they are known.
+    """
+    run = _current.get()
+    record = {'stage': name, 'seconds': None, 'rows': rows, 'peak_bytes': None,
+              'depth': len(run._open) if run is not None else 0}
+    tracing = run is not None and run.memory and tracemalloc.is_tracing()
+    if tracing:
+        current, peak = tracemalloc.get_traced_memory()
+        if run._open and run._open[-1] is not None:
+            # reset_peak below forgets the enclosing stage's peak so far
+            run._open[-1][1] = max(run._open[-1][1], peak)
+        tracemalloc.reset_peak()
+        run._open.append([current, current])
+    elif run is not None:
+        run._open.append(None)
+
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['seconds'] = time.perf_counter() - started
+        if run is not None:
+            entry = run._open.pop()
+            if tracing and entry is not None:
+                peak = max(entry[1], tracemalloc.get_traced_memory()[1])
+                record['peak_bytes'] = peak - entry[0]
+                if run._open and run._open[-1] is not None:
+                    run._open[-1][1] = max(run._open[-1][1], peak)
+            run.stages.append(record)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(dict(record, event='stage', time=time.time(), pid=os.getpid()), default=str))
+
+
+def timed(name, rows=None):
+    """
+    Decorator recording every call as a stage
+
+    rows(result, *args, **kwargs) gives the rows the call processed.
+    """
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name) as record:
+                result = function(*args, **kwargs)
+                if rows is not None:
+                    try:
+                        record['rows'] = rows(result, *args, **kwargs)
+                    except Exception:
+                        pass
+                return result
+        return wrapper
+    return decorate
+
+
+def frame_rows(result, *args, **kwargs):
+    """
+    rows callable for functions returning a DataFrame
+    """
+    return len(result) if result is not None else 0
+
@@ -0,0 +1,146 @@
+"""
+Concurrent computation of independent report sections
+
+Time-based sections (timelines, activity maps, heatmap, busy users) are
+pandas/NumPy work and run in a shared thread pool. Text sections depend on
+token store components whose construction is pure-Python and holds the
+GIL, so for large chats those components (URL extraction, word cleaning and
+counting, emoji scanning) are built in a shared process pool and installed
+into the chat's TokenStore; the sections themselves then run in threads.
+"""
+import contextvars
+import multiprocessing
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from helper import ChatIndex
+from tokens import TokenStore
+
+# Size of the shared pools: all sessions together never use more workers than this
+WORKERS = int(os.environ.get('WHATSAPP_ANALYZER_WORKERS', os.cpu_count() or 1))
+
+# Tasks one analysis keeps in flight, so one user's chat cannot take over a shared server
+SESSION_WORKERS = int(os.environ.get('WHATSAPP_ANALYZER_SESSION_WORKERS', min(4, WORKERS)))
+
+# Smaller chats tokenize faster than a worker process receives their messages
+PROCESS_MIN_ROWS = 50_000
+
+# Token store component each text section waits for
+TEXT_COMPONENTS = {
+    'stats': '_urls',
+    'top_domains': '_urls',
+    'distinct': 'word_matrix',
+    'wordcloud': 'word_matrix',
+    'common_words': 'word_matrix',
+    'emojis': '_emojis',
+}
+
+# Cached TokenStore attributes a component fills in
+COMPONENT_ATTRIBUTES = {
+    '_urls': ('_urls',),
+    'word_matrix': ('_cleaned', 'word_matrix'),
+    '_emojis': ('_emojis',),
+}
+
+_lock = threading.Lock()
+_threads = None
+_processes = None
+
+
+def thread_pool():
+    """
+    Thread pool shared by every session, created on first use
+    """
+    global _threads
+    with _lock:
+        if _threads is None:
+            _threads = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='section')
+        return _threads
+
+
+def process_pool():
+    """
+    Process pool shared by every session, created on first use (and again if a worker died)
+    """
+    global _processes
+    with _lock:
+        if _processes is None or getattr(_processes, '_broken', False):
+            # Spawned workers start clean, like the parser's own pool
+            _processes = ProcessPoolExecutor(max_workers=WORKERS,
+                                             mp_context=multiprocessing.get_context('spawn'))
+        return _processes
+
+
+def build_component(store, component):
+    """
+    Process pool entry point: build one token store component and return the attributes it fills
+    """
+    getattr(store, component)
+    return {name: store.__dict__[name] for name in COMPONENT_ATTRIBUTES[component]}
+
+
+def _bare_store(store):
+    # Only what the components are built from is sent to the worker
+    bare = TokenStore.__new__(TokenStore)
+    bare.users, bare.kinds, bare.messages, bare.size = store.users, store.kinds, store.messages, store.size
+    return bare
+
+
+def compute(report, names, max_workers=None):
+    """
+    Compute report sections concurrently, yielding each name once its value is ready
+
+    Sections already computed are yielded first. At most max_workers tasks
+    (default SESSION_WORKERS) are in flight at once; the caller can render
+    each section as it is yielded while the rest keep computing.
+    """
+    max_workers = max(1, max_workers or SESSION_WORKERS)
+    index = report.index
+    store = index.tokens if isinstance(index, ChatIndex) else None
+    use_processes = store is not None and store.size >= PROCESS_MIN_ROWS and WORKERS > 1
+
+    queue, waiting = [], {}
+    for name in dict.fromkeys(names):
+        if name in report.computed:
+            yield name
+            continue
+        component = TEXT_COMPONENTS.get(name) if store is not None else None
+        if component is None or component in store.__dict__:
+            queue.append(('section', name))
+            continue
+        if component not in waiting:
+            waiting[component] = []
+            queue.insert(0, ('component', component))
+        waiting[component].append(name)
+
+    in_flight = {}
+    while queue or in_flight:
+        while queue and len(in_flight) < max_workers:
+            kind, item = queue.pop(0)
+            if kind == 'component' and use_processes:
+                future = process_pool().submit(build_component, _bare_store(store), item)
+            elif kind == 'component':
+                # Built straight into the shared store, so nothing needs installing
+                future = thread_pool().submit(contextvars.copy_context().run, getattr, store, item)
+            else:
+                # Copying the context lets profiling record the section into this run
+                future = thread_pool().submit(contextvars.copy_context().run, getattr, report, item)
+            in_flight[future] = (kind, item)
+
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            kind, item = in_flight.pop(future)
+            if kind == 'component':
+                try:
+                    attributes = future.result()
+                    if isinstance(attributes, dict):
+                        for name, value in attributes.items():
+                            store.__dict__.setdefault(name, value)
+                except Exception as e:
+                    # e.g. a worker died; the sections build the component themselves instead
+                    print(f"Error in scheduler: {e}")
+                queue.extend(('section', name) for name in waiting.pop(item))
+            else:
+                # Helpers report their own errors and return empty results
+                future.result()
+                yield item
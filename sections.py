@@ -0,0 +1,462 @@
+"""
+Dashboard sections, each rendering one part of a helper.AnalysisReport
+
+Every section is a Streamlit fragment: widgets inside it rerun that section
+only, not the whole script. Report values are computed on first access, so
+a section that is never shown costs nothing. Static charts import
+matplotlib and seaborn on a figure cache miss only, and the native chart
+backend never does.
+"""
+import streamlit as st
+import pandas as pd
+import charts
+import profiling
+import scheduler
+
+
+@st.fragment
+def render_stats(report):
+    """
+    Message, word, media and link totals, distinct counts and top domains
+    """
+    num_messages, words, num_media_messages, num_links = report.stats
+
+    col1, col2, col3, col4 = st.columns(4)
+
+    with col1:
+        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+        st.metric("📨 Total Messages", f"{num_messages:,}")
+        st.markdown('</div>', unsafe_allow_html=True)
+
+    with col2:
+        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+        st.metric("💬 Total Words", f"{words:,}")
+        st.markdown('</div>', unsafe_allow_html=True)
+
+    with col3:
+        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+        st.metric("🖼️ Media Shared", f"{num_media_messages:,}")
+        st.markdown('</div>', unsafe_allow_html=True)
+
+    with col4:
+        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+        st.metric("🔗 Links Shared", f"{num_links:,}")
+        st.markdown('</div>', unsafe_allow_html=True)
+
+    distinct_words, participants = report.distinct
+    prefix = "≈ " if report.approximate else ""
+    st.caption(f"🔤 Distinct words: {prefix}{distinct_words:,} · 👥 Participants: {prefix}{participants:,}")
+    if report.approximate:
+        st.info(f"≈ Approximate mode: word, emoji and distinct counts are sketch estimates. "
+                f"Word and emoji counts may overestimate by up to {report.index.error:.2%} of all words.")
+
+    if num_links:
+        # Domains are only extracted when the expander is opened
+        domains = st.expander("🔗 Top Shared Domains", key='domains_expander', on_change='rerun')
+        if domains.open:
+            with domains:
+                st.dataframe(report.top_domains, width='stretch')
+
+
+def _native():
+    # Sidebar option in app.py; static matplotlib images otherwise
+    return st.session_state.get('native_charts', False)
+
+
+def _show(name, report, data, draw):
+    # Static figures are rasterised once per chart, user and data, then served from the cache
+    st.image(charts.figure(name, report.selected_user, data, draw), width='stretch')
+
+
+def _monthly_figure(timeline):
+    import matplotlib.pyplot as plt
+    keep = charts.downsample(timeline, 'time', 'message')
+    shown = timeline.iloc[keep]
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.plot(keep, shown['message'], color='#25D366', linewidth=2.5, marker='o')
+    ax.fill_between(keep, shown['message'], alpha=0.3, color='#25D366')
+    ax.set_xlabel('Month-Year', fontsize=12)
+    ax.set_ylabel('Number of Messages', fontsize=12)
+    ax.set_title('Monthly Activity Trend', fontsize=14, fontweight='bold')
+    # Positions keep months evenly spaced when some are dropped; only some are labelled
+    labelled = charts.ticks(len(timeline))
+    ax.set_xticks(labelled, timeline['time'].iloc[labelled], rotation=45, ha='right')
+    plt.grid(True, alpha=0.3)
+    return fig
+
+
+def _daily_figure(daily_timeline):
+    import matplotlib.pyplot as plt
+    keep = charts.downsample(daily_timeline, 'only_date', 'message')
+    shown = daily_timeline.iloc[keep]
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.plot(shown['only_date'], shown['message'],
+           color='#128C7E', linewidth=2)
+    ax.set_xlabel('Date', fontsize=12)
+    ax.set_ylabel('Number of Messages', fontsize=12)
+    ax.set_title('Daily Activity Trend', fontsize=14, fontweight='bold')
+    plt.xticks(rotation=45, ha='right')
+    plt.grid(True, alpha=0.3)
+    return fig
+
+
+@st.fragment
+def render_timelines(report):
+    """
+    Monthly and daily message counts, downsampled to what the chart can show
+    """
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.markdown("### Monthly Timeline")
+        timeline = report.monthly_timeline
+        if not timeline.empty:
+            with profiling.stage('render.monthly_timeline', rows=len(timeline)):
+                if _native():
+                    keep = charts.downsample(timeline, 'time', 'message')
+                    st.vega_lite_chart(timeline.iloc[keep], charts.line_spec(
+                        'time', 'message', 'Month-Year', 'Number of Messages', '#25D366', points=True),
+                        width='stretch')
+                else:
+                    _show('monthly_timeline', report, timeline, lambda: _monthly_figure(timeline))
+
+    with col2:
+        st.markdown("### Daily Timeline")
+        daily_timeline = report.daily_timeline
+        if not daily_timeline.empty:
+            with profiling.stage('render.daily_timeline', rows=len(daily_timeline)):
+                if _native():
+                    keep = charts.downsample(daily_timeline, 'only_date', 'message')
+                    st.vega_lite_chart(daily_timeline.iloc[keep], charts.line_spec(
+                        'only_date', 'message', 'Date', 'Number of Messages', '#128C7E', temporal=True),
+                        width='stretch')
+                else:
+                    _show('daily_timeline', report, daily_timeline, lambda: _daily_figure(daily_timeline))
+
+
+def _activity_figure(activity, colormap, xlabel, title):
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(10, 6))
+    colors = getattr(plt.cm, colormap)(range(len(activity)))
+    ax.bar(activity.index, activity.values, color=colors)
+    ax.set_xlabel(xlabel, fontsize=12)
+    ax.set_ylabel('Number of Messages', fontsize=12)
+    ax.set_title(title, fontsize=14, fontweight='bold')
+    plt.xticks(rotation=45)
+    return fig
+
+
+@st.fragment
+def render_activity(report):
+    """
+    Messages per weekday and per month
+    """
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.markdown("### Most Active Day")
+        busy_day = report.week_activity
+        if not busy_day.empty:
+            with profiling.stage('render.week_activity', rows=len(busy_day)):
+                if _native():
+                    st.vega_lite_chart(charts.series_frame(busy_day, 'day', 'messages'), charts.bar_spec(
+                        'day', 'messages', 'Day of Week', 'Number of Messages', 'set3'), width='stretch')
+                else:
+                    _show('week_activity', report, busy_day,
+                          lambda: _activity_figure(busy_day, 'Set3', 'Day of Week', 'Activity by Day'))
+
+    with col2:
+        st.markdown("### Most Active Month")
+        busy_month = report.month_activity
+        if not busy_month.empty:
+            with profiling.stage('render.month_activity', rows=len(busy_month)):
+                if _native():
+                    st.vega_lite_chart(charts.series_frame(busy_month, 'month', 'messages'), charts.bar_spec(
+                        'month', 'messages', 'Month', 'Number of Messages', 'paired'), width='stretch')
+                else:
+                    _show('month_activity', report, busy_month,
+                          lambda: _activity_figure(busy_month, 'Paired', 'Month', 'Activity by Month'))
+
+
+def _heatmap_figure(heatmap):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    fig, ax = plt.subplots(figsize=(12, 6))
+    sns.heatmap(heatmap, cmap='YlGnBu', linewidths=0.5, linecolor='gray',
+               cbar_kws={'label': 'Number of Messages'})
+    ax.set_xlabel('Time Period (Hour)', fontsize=12)
+    ax.set_ylabel('Day of Week', fontsize=12)
+    ax.set_title('Activity Heatmap (Day vs Time)', fontsize=14, fontweight='bold')
+    return fig
+
+
+@st.fragment
+def render_heatmap(report):
+    """
+    Messages per weekday and hour
+    """
+    heatmap = report.heatmap
+    if not heatmap.empty:
+        with profiling.stage('render.heatmap', rows=heatmap.size):
+            if _native():
+                cells = heatmap.rename_axis(index='day', columns='period').stack().rename('messages').reset_index()
+                cells[['day', 'period']] = cells[['day', 'period']].astype(str)
+                st.vega_lite_chart(cells, charts.heatmap_spec(
+                    'period', 'day', 'messages', 'Time Period (Hour)', 'Day of Week', 'Number of Messages'),
+                    width='stretch')
+            else:
+                _show('heatmap', report, heatmap, lambda: _heatmap_figure(heatmap))
+
+
+def _busy_users_figure(x):
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(10, 6))
+    colors = plt.cm.viridis(range(len(x)))
+    bars = ax.bar(x.index, x.values, color=colors)
+    ax.set_xlabel('Users', fontsize=12)
+    ax.set_ylabel('Number of Messages', fontsize=12)
+    ax.set_title('Top Contributors', fontsize=14, fontweight='bold')
+    plt.xticks(rotation=45, ha='right')
+
+    # Add value labels on bars
+    for bar in bars:
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width()/2., height + 0.1,
+               f'{int(height):,}', ha='center', va='bottom', fontsize=10)
+    return fig
+
+
+@st.fragment
+def render_busy_users(report):
+    """
+    Most active users and their share of messages (Overall only)
+    """
+    x, new_df = report.busy_users
+
+    col1, col2 = st.columns([3, 2])
+
+    with col1:
+        st.markdown("### Most Active Users")
+        with profiling.stage('render.busy_users', rows=len(x)):
+            if _native():
+                st.vega_lite_chart(charts.series_frame(x, 'user', 'messages'), charts.bar_spec(
+                    'user', 'messages', 'Users', 'Number of Messages', 'viridis'), width='stretch')
+            else:
+                _show('busy_users', report, x, lambda: _busy_users_figure(x))
+
+    with col2:
+        st.markdown("### User Contribution")
+        st.dataframe(new_df, width='stretch')
+
+
+def _wordcloud_figure(wc):
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.imshow(wc, interpolation='bilinear')
+    ax.axis("off")
+    ax.set_title('Frequent Words', fontsize=14, fontweight='bold')
+    return fig
+
+
+@st.fragment
+def render_wordcloud(report):
+    """
+    Word cloud of the most frequent words
+    """
+    st.markdown("### Word Cloud")
+    try:
+        wc = report.wordcloud
+        if wc:
+            with profiling.stage('render.wordcloud'):
+                if _native():
+                    # The cloud is already an image; only matplotlib's frame and title are skipped
+                    _show('wordcloud_image', report, wc.layout_, wc.to_image)
+                else:
+                    _show('wordcloud', report, wc.layout_, lambda: _wordcloud_figure(wc))
+    except Exception as e:
+        print(f"Error in word cloud: {e}")
+        st.warning("Word cloud could not be generated.")
+
+
+def _common_words_figure(common_df):
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(10, 6))
+    colors = plt.cm.coolwarm(range(len(common_df)))
+    bars = ax.barh(common_df[0], common_df[1], color=colors)
+    ax.set_xlabel('Frequency', fontsize=12)
+    ax.set_ylabel('Words', fontsize=12)
+    ax.set_title('Top 20 Most Used Words', fontsize=14, fontweight='bold')
+    ax.invert_yaxis()
+
+    # Add value labels
+    for i, (value, bar) in enumerate(zip(common_df[1], bars)):
+        ax.text(value + 0.1, bar.get_y() + bar.get_height()/2,
+               f' {value}', va='center', fontsize=10)
+    return fig
+
+
+@st.fragment
+def render_common_words(report):
+    """
+    Top 20 words as a horizontal bar chart
+    """
+    st.markdown("### Most Common Words")
+    common_df = report.common_words
+    if not common_df.empty:
+        with profiling.stage('render.common_words', rows=len(common_df)):
+            if _native():
+                words = pd.DataFrame({'word': common_df[0].astype(str), 'count': common_df[1]})
+                st.vega_lite_chart(words, charts.bar_spec(
+                    'word', 'count', 'Words', 'Frequency', 'redblue', horizontal=True), width='stretch')
+            else:
+                _show('common_words', report, common_df, lambda: _common_words_figure(common_df))
+
+
+def _emojis_figure(emoji_df):
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(8, 8))
+    # Fixed: Use column names instead of indices
+    if 'Count' in emoji_df.columns and 'Emoji' in emoji_df.columns:
+        ax.pie(emoji_df['Count'].head(10), labels=emoji_df['Emoji'].head(10),
+              autopct='%1.1f%%', startangle=90,
+              colors=plt.cm.tab20c(range(len(emoji_df.head(10)))))
+    else:
+        # Fallback to index-based access
+        ax.pie(emoji_df.iloc[:, 1].head(10), labels=emoji_df.iloc[:, 0].head(10),
+              autopct='%1.1f%%', startangle=90,
+              colors=plt.cm.tab20c(range(len(emoji_df.head(10)))))
+    ax.set_title('Top 10 Emoji Usage', fontsize=14, fontweight='bold')
+    ax.axis('equal')
+    return fig
+
+
+@st.fragment
+def render_emojis(report):
+    """
+    Top emojis as a table and a pie chart
+    """
+    emoji_df = report.emojis
+
+    if not emoji_df.empty:
+        col1, col2 = st.columns([2, 3])
+
+        with col1:
+            st.markdown("### Top Emojis")
+            st.dataframe(emoji_df.head(10), width='stretch')
+
+        with col2:
+            st.markdown("### Emoji Distribution")
+            with profiling.stage('render.emojis', rows=min(len(emoji_df), 10)):
+                top = emoji_df.head(10)
+                if _native():
+                    shares = pd.DataFrame({'Emoji': top.iloc[:, 0].astype(str), 'Count': top.iloc[:, 1]})
+                    st.vega_lite_chart(shares, charts.pie_spec('Emoji', 'Count', 'tableau20'), width='stretch')
+                else:
+                    _show('emojis', report, top, lambda: _emojis_figure(emoji_df))
+    else:
+        st.write("No emojis found in the chat.")
+
+
+@st.fragment
+def render_export(report):
+    """
+    CSV downloads of the statistics, monthly timeline and emoji counts
+    """
+    selected_user = report.selected_user
+    num_messages, words, num_media_messages, num_links = report.stats
+    emoji_df = report.emojis
+
+    col1, col2, col3 = st.columns(3)
+
+    # Downloads need no rerun: the data is already on the page
+    with col1:
+        stats_df = pd.DataFrame({
+            'Metric': ['Total Messages', 'Total Words', 'Media Shared', 'Links Shared'],
+            'Value': [num_messages, words, num_media_messages, num_links]
+        })
+        st.download_button(
+            label="📊 Download Statistics CSV",
+            data=stats_df.to_csv(index=False),
+            file_name=f"chat_stats_{selected_user}.csv",
+            mime="text/csv",
+            on_click='ignore'
+        )
+
+    with col2:
+        st.download_button(
+            label="📅 Download Timeline CSV",
+            data=report.monthly_timeline.to_csv(index=False),
+            file_name=f"timeline_{selected_user}.csv",
+            mime="text/csv",
+            on_click='ignore'
+        )
+
+    with col3:
+        if not emoji_df.empty:
+            st.download_button(
+                label="😊 Download Emoji Data",
+                data=emoji_df.to_csv(index=False),
+                file_name=f"emoji_analysis_{selected_user}.csv",
+                mime="text/csv",
+                on_click='ignore'
+            )
+
+
+# Sections behind tabs in progressive mode, computed only while their tab is open
+DETAIL_TABS = {
+    "🔥 Heatmap": render_heatmap,
+    "👥 Users": render_busy_users,
+    "☁️ Word Cloud": render_wordcloud,
+    "📝 Common Words": render_common_words,
+    "😊 Emojis": render_emojis,
+    "📥 Export": render_export,
+}
+
+
+@st.fragment
+def render_details(report):
+    """
+    Expensive sections in tabs; switching tabs reruns this fragment only
+    """
+    labels = [label for label in DETAIL_TABS
+              if label != "👥 Users" or report.selected_user == "Overall"]
+    tabs = st.tabs(labels, key='detail_tabs', on_change='rerun')
+    for label, tab in zip(labels, tabs):
+        if tab.open:
+            with tab:
+                DETAIL_TABS[label](report)
+
+
+# Report values each section draws
+SECTION_DATA = {
+    render_stats: ('stats', 'distinct'),
+    render_timelines: ('monthly_timeline', 'daily_timeline'),
+    render_activity: ('week_activity', 'month_activity'),
+    render_heatmap: ('heatmap',),
+    render_busy_users: ('busy_users',),
+    render_wordcloud: ('wordcloud',),
+    render_common_words: ('common_words',),
+    render_emojis: ('emojis',),
+    render_export: ('stats', 'monthly_timeline', 'emojis'),
+}
+
+
+def render_concurrently(report, slots, max_workers=None):
+    """
+    Compute the data of every section at once and draw each section as soon as its data is ready
+
+    slots maps section functions to the st.empty() placeholders they are drawn in,
+    so sections keep their place on the page whatever order they finish in.
+    """
+    for slot in slots.values():
+        slot.caption("⏳ Computing...")
+
+    pending = dict(slots)
+    ready = set()
+    names = [name for render in slots for name in SECTION_DATA[render]]
+    for name in scheduler.compute(report, names, max_workers):
+        ready.add(name)
+        for render in [render for render in pending if ready.issuperset(SECTION_DATA[render])]:
+            with pending.pop(render).container():
+                render(report)
+
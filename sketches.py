@@ -0,0 +1,269 @@
+import math
+import sys
+import numpy as np
+import pandas as pd
+import cache
+
+# Default bounds: counts overestimate by at most DEFAULT_ERROR x total with probability 1 - DEFAULT_DELTA
+DEFAULT_ERROR = 0.001
+DEFAULT_DELTA = 0.01
+
+# Default relative standard error of distinct counts
+DEFAULT_DISTINCT_ERROR = 0.01
+
+# Mixes a user's hash into an item's hash for per-user counts in the shared Count-Min table
+PAIR_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def hash_items(items):
+    """
+    Stable 64-bit hashes of strings, identical across processes (unlike hash())
+    """
+    if len(items) == 0:
+        return np.array([], dtype=np.uint64)
+    return pd.util.hash_array(np.asarray(items, dtype=object))
+
+
+def _bit_length(values):
+    """
+    Bit length of each uint64, computed exactly on 32-bit halves
+    """
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(high > 0, 32 + np.frexp(high)[1], np.frexp(low)[1])
+
+
+class CountMinSketch:
+    """
+    Count-Min sketch: estimates never undercount and overcount by at most
+    error x total with probability 1 - delta. Sketches of equal shape merge
+    by adding their tables.
+    """
+
+    def __init__(self, error=DEFAULT_ERROR, delta=DEFAULT_DELTA):
+        self.width = math.ceil(math.e / error)
+        self.depth = math.ceil(math.log(1 / delta))
+        self.table = np.zeros((self.depth, self.width), dtype=np.int64)
+
+    @property
+    def nbytes(self):
+        return self.table.nbytes
+
+    def _columns(self, hashes):
+        # Double hashing: row i uses h1 + i * h2
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = hashes >> np.uint64(32)
+        return [((h1 + np.uint64(row) * h2) % np.uint64(self.width)).astype(np.intp)
+                for row in range(self.depth)]
+
+    def add(self, hashes, counts):
+        for row, columns in enumerate(self._columns(hashes)):
+            np.add.at(self.table[row], columns, counts)
+        return self
+
+    def estimate(self, hashes):
+        if len(hashes) == 0:
+            return np.array([], dtype=np.int64)
+        return np.min([self.table[row][columns]
+                       for row, columns in enumerate(self._columns(hashes))], axis=0)
+
+    def merge(self, other):
+        merged = CountMinSketch.__new__(CountMinSketch)
+        merged.width, merged.depth = self.width, self.depth
+        merged.table = self.table + other.table
+        return merged
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy hitters: the capacity most frequent items with counts that
+    overestimate by at most their error (and by at most total / capacity)
+
+    Merging adds counts over the union of items; an item missing from a full
+    summary is charged that summary's smallest count, keeping the bound.
+    """
+
+    def __init__(self, capacity, items=None, counts=None):
+        self.capacity = capacity
+        self.items = np.asarray(items if items is not None else [], dtype=object)
+        self.counts = np.asarray(counts if counts is not None else [], dtype=np.int64)
+        self.errors = np.zeros(len(self.items), dtype=np.int64)
+        self._truncate()
+
+    def _truncate(self):
+        if len(self.items) > self.capacity:
+            # Items dropped here never exceed the smallest count kept
+            keep = np.sort(np.argsort(-self.counts, kind='stable')[:self.capacity])
+            self.items, self.counts, self.errors = self.items[keep], self.counts[keep], self.errors[keep]
+
+    @property
+    def nbytes(self):
+        """
+        Memory of the tracked items, strings included, and their counts
+        """
+        return cache.nbytes(self.items) + self.counts.nbytes + self.errors.nbytes
+
+    @property
+    def floor(self):
+        """
+        Upper bound on the count of any item not tracked
+        """
+        return int(self.counts.min()) if len(self.items) >= self.capacity else 0
+
+    def merge(self, other):
+        codes, items = pd.factorize(np.concatenate([self.items, other.items]))
+        ours, theirs = codes[:len(self.items)], codes[len(self.items):]
+
+        counts = np.full(len(items), self.floor + other.floor, dtype=np.int64)
+        errors = counts.copy()
+        counts[ours] += self.counts - self.floor
+        errors[ours] += self.errors - self.floor
+        counts[theirs] += other.counts - other.floor
+        errors[theirs] += other.errors - other.floor
+
+        merged = SpaceSaving(self.capacity)
+        merged.items, merged.counts, merged.errors = np.asarray(items, dtype=object), counts, errors
+        merged._truncate()
+        return merged
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct counter with relative standard error about 1.04 / sqrt(2 ** precision)
+
+    Sketches of equal precision merge by taking the register-wise maximum.
+    """
+
+    def __init__(self, error=DEFAULT_DISTINCT_ERROR):
+        self.precision = min(max(math.ceil(math.log2((1.04 / error) ** 2)), 4), 18)
+        self.registers = np.zeros(2 ** self.precision, dtype=np.uint8)
+
+    @property
+    def nbytes(self):
+        return self.registers.nbytes
+
+    def add(self, hashes):
+        if len(hashes):
+            shift = np.uint64(64 - self.precision)
+            buckets = (hashes >> shift).astype(np.intp)
+            rest = hashes & ((np.uint64(1) << shift) - np.uint64(1))
+            ranks = (64 - self.precision) - _bit_length(rest) + 1
+            np.maximum.at(self.registers, buckets, ranks.astype(np.uint8))
+        return self
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = np.count_nonzero(self.registers == 0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def merge(self, other):
+        merged = HyperLogLog.__new__(HyperLogLog)
+        merged.precision = self.precision
+        merged.registers = np.maximum(self.registers, other.registers)
+        return merged
+
+
+class TopKSketch:
+    """
+    Approximate user x item counts answering the same top() queries as tokens.WordMatrix
+
+    Heavy hitters per user and for the whole chat come from Space-Saving
+    summaries; their counts are tightened with one Count-Min table over
+    (user, item) pairs and one over items. Distinct items per user are
+    counted with HyperLogLog. Memory depends on the error bound and the
+    number of users, not on the vocabulary.
+    """
+
+    def __init__(self, error=DEFAULT_ERROR, delta=DEFAULT_DELTA, distinct_error=DEFAULT_DISTINCT_ERROR):
+        self.error = error
+        self.distinct_error = distinct_error
+        self.capacity = math.ceil(1 / error)
+        self.top_items = SpaceSaving(self.capacity)
+        self.user_top_items = {}
+        self.counts = CountMinSketch(error, delta)
+        self.user_counts = CountMinSketch(error, delta)
+        self.distinct_items = HyperLogLog(distinct_error)
+        self.user_distinct_items = {}
+
+    @property
+    def nbytes(self):
+        """
+        Memory of the chat-wide and per-user summaries, tables and counters
+        """
+        size = self.top_items.nbytes + self.counts.nbytes + self.user_counts.nbytes + self.distinct_items.nbytes
+        for sketches in (self.user_top_items, self.user_distinct_items):
+            size += sys.getsizeof(sketches) + sum(cache.nbytes(user) + sketch.nbytes
+                                                  for user, sketch in sketches.items())
+        return size
+
+    @staticmethod
+    def _pair_hashes(user, item_hashes):
+        return item_hashes ^ (hash_items([user]) * PAIR_MULTIPLIER)[0]
+
+    @classmethod
+    def from_matrix(cls, matrix, error=DEFAULT_ERROR, delta=DEFAULT_DELTA,
+                    distinct_error=DEFAULT_DISTINCT_ERROR):
+        """
+        Sketch of the exact counts in a tokens.WordMatrix, e.g. one chunk of a chat
+        """
+        sketch = cls(error, delta, distinct_error)
+        words, counts = matrix.used()
+        hashes = hash_items(matrix.vocabulary)
+        sketch.top_items = SpaceSaving(sketch.capacity, matrix.vocabulary[words], counts)
+        sketch.counts.add(hashes[words], counts)
+        sketch.distinct_items.add(hashes[words])
+
+        for user in matrix.users:
+            words, counts = matrix.used([user])
+            sketch.user_top_items[user] = SpaceSaving(sketch.capacity, matrix.vocabulary[words], counts)
+            sketch.user_counts.add(cls._pair_hashes(user, hashes[words]), counts)
+            sketch.user_distinct_items[user] = HyperLogLog(distinct_error).add(hashes[words])
+        return sketch
+
+    def merge(self, other):
+        merged = TopKSketch.__new__(TopKSketch)
+        merged.error, merged.distinct_error, merged.capacity = self.error, self.distinct_error, self.capacity
+        merged.top_items = self.top_items.merge(other.top_items)
+        merged.counts = self.counts.merge(other.counts)
+        merged.user_counts = self.user_counts.merge(other.user_counts)
+        merged.distinct_items = self.distinct_items.merge(other.distinct_items)
+        merged.user_top_items = dict(self.user_top_items)
+        merged.user_distinct_items = dict(self.user_distinct_items)
+        for user, top_items in other.user_top_items.items():
+            mine = merged.user_top_items.get(user)
+            merged.user_top_items[user] = top_items if mine is None else mine.merge(top_items)
+            mine = merged.user_distinct_items.get(user)
+            theirs = other.user_distinct_items[user]
+            merged.user_distinct_items[user] = theirs if mine is None else mine.merge(theirs)
+        return merged
+
+    def top(self, n, users=None):
+        """
+        The n (None = all tracked) most used (item, estimated count) pairs for
+        the whole chat (users=None) or a single user
+        """
+        if users is None:
+            summary, estimates = self.top_items, self.counts.estimate(hash_items(self.top_items.items))
+        else:
+            summary = self.user_top_items.get(users[0])
+            if summary is None:
+                return []
+            estimates = self.user_counts.estimate(self._pair_hashes(users[0], hash_items(summary.items)))
+
+        counts = np.minimum(summary.counts, estimates)
+        order = np.argsort(-counts, kind='stable')[:n]
+        return [(summary.items[item], int(counts[item])) for item in order if counts[item] > 0]
+
+    def distinct(self, users=None):
+        """
+        Estimated number of distinct items for the whole chat or a single user
+        """
+        if users is None:
+            return self.distinct_items.estimate()
+        sketch = self.user_distinct_items.get(users[0])
+        return sketch.estimate() if sketch is not None else 0
@@ -0,0 +1,194 @@
+from collections import Counter
+import numpy as np
+import pandas as pd
+import cache
+import ingest
+import preprocessor
+import profiling
+import sketches
+from preprocessor import MessageKind, factorize_users
+from tokens import DOMAIN_RE, TokenStore, WordMatrix
+from timecube import TimeCube
+
+
+class ChatSummary:
+    """
+    Mergeable per-user aggregates of a chat, kept after its messages are gone
+
+    Holds per-user message/word/media/link counts, user x word, emoji and
+    domain counts, and the time cube. Two summaries merge as if the second
+    chat's messages followed the first's, so a chat can be summarized chunk
+    by chunk with memory bounded by the chunk size plus the aggregates.
+
+    With an error bound, word and emoji counts are kept in sketches.TopKSketch
+    instead, so they no longer grow with the vocabulary, and participants are
+    also counted with HyperLogLog; the results are then approximate.
+    """
+
+    def __init__(self, df, key=None, error=None):
+        store = TokenStore(df)
+        user_codes, users = factorize_users(df['user'])
+        self.users = list(users)
+        self.key = key
+        self.error = error
+        self.attrs = dict(df.attrs)
+
+        def per_user(values):
+            return np.bincount(user_codes, weights=values, minlength=len(users)).astype(np.int64)
+
+        self.messages = np.bincount(user_codes, minlength=len(users)).astype(np.int64)
+        self.non_system = per_user(store.kinds != MessageKind.SYSTEM)
+        self.words = per_user(store.word_counts)
+        self.media = per_user(store.media)
+        self.links = per_user(store.url_counts)
+
+        self.word_matrix = store.word_matrix
+        self.emoji_matrix = WordMatrix(
+            store.emojis, np.repeat(user_codes, np.diff(store.emoji_offsets)), users)
+        if error is not None:
+            self.word_matrix = sketches.TopKSketch.from_matrix(self.word_matrix, error)
+            self.emoji_matrix = sketches.TopKSketch.from_matrix(self.emoji_matrix, error)
+            senders = np.asarray(users, dtype=object)[np.flatnonzero(self.non_system)]
+            self.participant_sketch = sketches.HyperLogLog().add(sketches.hash_items(senders))
+
+        domains = pd.Series(store.urls, dtype=object).str.extract(DOMAIN_RE)[0].str.lower()
+        found = domains.notna().to_numpy()
+        url_users = np.repeat(user_codes, np.diff(store.url_offsets))
+        self.domain_matrix = WordMatrix(domains.to_numpy()[found], url_users[found], users)
+
+        self.time_cube = TimeCube(df)
+
+    def merge(self, other):
+        """
+        Summary of both chats, other's messages following this chat's
+        """
+        known = set(self.users)
+        users = self.users + [user for user in other.users if user not in known]
+        codes = {user: code for code, user in enumerate(users)}
+        mapping = np.array([codes[user] for user in other.users], dtype=np.int64)
+
+        merged = ChatSummary.__new__(ChatSummary)
+        merged.users = users
+        merged.key = self.key
+        merged.error = self.error
+        merged.attrs = self.attrs
+        if self.error is not None:
+            merged.participant_sketch = self.participant_sketch.merge(other.participant_sketch)
+        for name in ('messages', 'non_system', 'words', 'media', 'links'):
+            counts = np.zeros(len(users), dtype=np.int64)
+            counts[:len(self.users)] = getattr(self, name)
+            counts[mapping] += getattr(other, name)
+            setattr(merged, name, counts)
+        for name in ('word_matrix', 'emoji_matrix', 'domain_matrix', 'time_cube'):
+            setattr(merged, name, getattr(self, name).merge(getattr(other, name)))
+        return merged
+
+    @property
+    def participants(self):
+        """
+        Users with at least one non-system message
+        """
+        return [str(user) for user, count in zip(self.users, self.non_system) if count]
+
+    @property
+    def approximate(self):
+        return self.error is not None
+
+    @property
+    def nbytes(self):
+        """
+        Memory of the counts, matrices or sketches, time cube and user names
+        """
+        return sum(cache.nbytes(value) for value in self.__dict__.values())
+
+    def selection(self, selected_user):
+        """
+        Users to reduce the aggregates over (None = whole chat)
+        """
+        return None if selected_user == 'Overall' else [selected_user]
+
+    def stats(self, selected_user):
+        """
+        (messages, words, media, links) as fetch_stats reports them
+        """
+        if selected_user == 'Overall':
+            rows = slice(None)
+        elif selected_user in self.users:
+            rows = self.users.index(selected_user)
+        else:
+            return 0, 0, 0, 0
+        return tuple(int(np.sum(getattr(self, name)[rows]))
+                     for name in ('messages', 'words', 'media', 'links'))
+
+    def busy_counts(self):
+        """
+        Non-system messages per user, ordered as value_counts orders the compact user column
+        """
+        counts = pd.Series(self.non_system, index=pd.Index(self.users, name='user'), name='count')
+        return counts.sort_index().sort_values(ascending=False, kind='stable'), int(self.non_system.sum())
+
+    def _used(self, matrix, selected_user):
+        words, counts = matrix.used(self.selection(selected_user))
+        return matrix.vocabulary[words], counts
+
+    def distinct(self, selected_user):
+        """
+        (distinct words, participants) of selected_user or the whole chat
+        """
+        users = self.selection(selected_user)
+        if self.approximate:
+            words = self.word_matrix.distinct(users)
+            participants = self.participant_sketch.estimate()
+        else:
+            words = len(self.word_matrix.used(users)[0])
+            participants = len(self.participants)
+        if users is not None:
+            participants = int(selected_user in self.participants)
+        return words, participants
+
+    def emoji_counter(self, selected_user):
+        """
+        Emoji counts in order of first use, as Counter(emojis) would hold them
+        (most used first when approximate)
+        """
+        if self.approximate:
+            return Counter(dict(self.emoji_matrix.top(None, self.selection(selected_user))))
+        return Counter(dict(zip(*self._used(self.emoji_matrix, selected_user))))
+
+    def domain_counts(self, selected_user):
+        """
+        Links per domain in order of first use
+        """
+        domains, counts = self._used(self.domain_matrix, selected_user)
+        return pd.Series(counts, index=pd.Index(domains, dtype=object), dtype=np.int64)
+
+
+def _summarized_rows(summary, *args, **kwargs):
+    return summary.stats('Overall')[0] if summary is not None else 0
+
+
+@profiling.timed('summarize', rows=_summarized_rows)
+def summarize(source, chunk_size=ingest.CHUNK_SIZE, key=None, error=None):
+    """
+    Stream an export through the parser and fold each chunk into one ChatSummary
+
+    Each parsed chunk is discarded once summarized, so peak memory depends on
+    chunk_size and the aggregates, not on the length of the chat. With an
+    error bound, word and emoji counts are sketched (see ChatSummary).
+    """
+    try:
+        summary = None
+        for chunk in preprocessor.iter_chunks(source, chunk_size):
+            if chunk.empty:
+                continue
+            part = ChatSummary(chunk, key=key, error=error)
+            summary = part if summary is None else summary.merge(part)
+
+        if summary is None:
+            raise ValueError("No valid messages found in the file")
+
+        return summary
+
+    except Exception as e:
+        print(f"Error in summarize: {e}")
+        return None
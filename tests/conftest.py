@@ -0,0 +1,54 @@
+import io
+import os
+import sys
+import zipfile
+import numpy as np
+import pandas as pd
+import pytest
+
+# The app's modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import helper
+
+
+def _assert_same(expected, actual, name):
+    if isinstance(expected, pd.DataFrame):
+        pd.testing.assert_frame_equal(actual, expected, check_dtype=False, obj=name)
+    elif isinstance(expected, pd.Series):
+        pd.testing.assert_series_equal(actual, expected, check_dtype=False, obj=name)
+    elif isinstance(expected, tuple):
+        assert len(actual) == len(expected), name
+        for i, (left, right) in enumerate(zip(expected, actual)):
+            _assert_same(left, right, f"{name}[{i}]")
+    elif hasattr(expected, 'words_'):
+        # Word clouds are compared by their word frequencies, not the rendered image
+        assert actual.words_ == expected.words_, name
+    else:
+        assert np.all(actual == expected), name
+
+
+@pytest.fixture
+def assert_same_report():
+    """
+    Check that two AnalysisReports hold the same value in every section
+    """
+    def check(expected, actual):
+        for name in helper.REPORT_SECTIONS:
+            _assert_same(getattr(expected, name), getattr(actual, name), name)
+    return check
+
+
+@pytest.fixture
+def upload():
+    """
+    In-memory upload of chat text as a plain, UTF-16 or zipped export
+    """
+    def make(text, container='utf-8'):
+        if container == 'zip':
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, 'w') as archive:
+                archive.writestr('WhatsApp Chat with Friends.txt', text.encode('utf-8'))
+            return io.BytesIO(buffer.getvalue())
+        return io.BytesIO(text.encode(container))
+    return make
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+import cache
+import helper
+import preprocessor
+from benchmarks.generator import generate_chat
+
+
+def test_resize_counts_growth_and_evicts():
+    memory = cache.MemoryCache(max_bytes=10_000)
+    memory.put(('old',), np.zeros(100, dtype=np.int8))
+    grows = [np.zeros(100, dtype=np.int8)]
+    memory.put(('index', 'k'), grows)
+
+    grows.append(np.zeros(9_700, dtype=np.int8))
+    memory.resize(('index', 'k'))
+
+    assert memory.stats()['bytes'] > 9_000
+    assert memory.get(('old',)) is None
+    assert memory.get(('index', 'k')) is grows
+
+
+def test_discard_drops_matching_keys():
+    memory = cache.MemoryCache(max_bytes=10_000)
+    for key in (('chat', 'k', True), ('index', 'k'), ('index', 'other')):
+        memory.put(key, np.zeros(10, dtype=np.int8))
+
+    memory.discard(lambda key: key[1:2] == ('k',))
+
+    assert memory.get(('index', 'other')) is not None
+    assert memory.stats()['entries'] == 1
+
+
+@pytest.fixture
+def disk_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(cache, 'memory', cache.MemoryCache(cache.MEMORY_MAX_BYTES))
+
+
+def split_messages(text):
+    """
+    Text of each message of a chat, continuation lines included
+    """
+    header = preprocessor.detect_format(text).header
+    messages = []
+    for line in text.splitlines(keepends=True):
+        if messages and not header.match(line):
+            messages[-1] += line
+        else:
+            messages.append(line)
+    return messages
+
+
+@pytest.mark.parametrize('container', ['utf-8', 'utf-16', 'zip'])
+@pytest.mark.parametrize('dropped', [0, 150], ids=['prefix', 'tail'])
+def test_newer_export_matches_full_parse(disk_cache, upload, assert_same_report, dropped, container):
+    messages = split_messages(generate_chat(messages=1200, users=5, seed=7))
+    # Both exports end with a line break, as WhatsApp writes them
+    old = ''.join(messages[:900])
+    new = ''.join(messages[dropped:])
+    # UTF-16 exports can't be decoded from an offset, so they are parsed again in full;
+    # an extended chat keeps the messages the newer export dropped
+    extended = container != 'utf-16'
+    expected = preprocessor.preprocess(''.join(messages if extended else messages[dropped:]))
+
+    old_key = cache.chat_key(upload(old, container))
+    base = cache.cached_preprocess(upload(old, container), key=old_key)
+    # Builds the token store and time cube, which the newer export's index extends
+    helper.analyze(helper.chat_index(base, old_key), 'Overall')
+
+    key = cache.chat_key(upload(new, container))
+    df = cache.cached_preprocess(upload(new, container), key=key)
+    index = helper.chat_index(df, key)
+
+    assert df.attrs.get('extends') == (old_key if extended else None)
+    assert ('tokens' in index.__dict__) == extended
+    pd.testing.assert_frame_equal(df, expected)
+    for user in ('Overall', index.users[0]):
+        assert_same_report(helper.analyze(expected, user), helper.analyze(index, user))
@@ -0,0 +1,119 @@
+import pandas as pd
+import pytest
+import ingest
+import preprocessor
+from benchmarks.generator import generate_chat
+
+
+def render_chat(chat_format, timestamps):
+    """
+    Chat text in chat_format with one message per timestamp
+    """
+    lines = []
+    for i, timestamp in enumerate(timestamps):
+        stamp = timestamp.strftime(chat_format.date_format)
+        header = f"[{stamp}] " if chat_format.name.startswith('ios') else f"{stamp} - "
+        lines.append(f"{header}User {i % 3}: message {i}")
+    return '\n'.join(lines) + '\n'
+
+
+@pytest.mark.parametrize('chat_format', preprocessor.FORMATS, ids=lambda chat_format: chat_format.name)
+def test_registry_round_trip(chat_format):
+    timestamps = pd.date_range('2023-01-05 08:00', periods=60, freq='13h')
+    df = preprocessor.preprocess(render_chat(chat_format, timestamps))
+
+    assert df.attrs['chat_format'] == chat_format.name
+    assert list(df['date']) == list(timestamps)
+
+
+@pytest.mark.parametrize('chat_format', [chat_format for chat_format in preprocessor.FORMATS
+                                         if chat_format.name.startswith('ios')],
+                         ids=lambda chat_format: chat_format.name)
+def test_ios_attachment_lines_round_trip(chat_format):
+    timestamps = pd.date_range('2023-01-05 08:00', periods=60, freq='13h')
+    lines = render_chat(chat_format, timestamps).splitlines()
+    # iOS puts a left-to-right mark before the header and the placeholder of attachments
+    for i in range(0, len(lines), 3):
+        header = lines[i].split(': ', 1)[0]
+        lines[i] = f"\u200e{header}: \u200eimage omitted"
+    df = preprocessor.preprocess('\n'.join(lines) + '\n')
+
+    assert df.attrs['chat_format'] == chat_format.name
+    assert list(df['date']) == list(timestamps)
+    kinds = df['message_kind'].to_numpy()
+    assert (kinds[::3] == preprocessor.MessageKind.MEDIA).all()
+    assert (kinds[1::3] == preprocessor.MessageKind.TEXT).all()
+
+
+def test_month_first_resolved_past_the_sample():
+    # Every stamp in the sniffed sample reads both ways; the 13th comes later
+    chat_format = preprocessor.FORMATS_BY_NAME['android_24h_mdy_yyyy']
+    timestamps = pd.date_range('2020-01-01', periods=3 * preprocessor.SAMPLE_LINES, freq='20min')
+    text = render_chat(chat_format, timestamps)
+
+    df = preprocessor.preprocess(text)
+    assert df.attrs['chat_format'] == chat_format.name
+    assert list(df['date']) == list(timestamps)
+
+    # Streamed blocks are held back until a stamp settles the order
+    chunks = list(preprocessor.iter_chunks(text.encode(), chunk_size=4096))
+    assert {chunk.attrs['chat_format'] for chunk in chunks} == {chat_format.name}
+    assert list(pd.concat(chunks)['date']) == list(timestamps)
+
+
+def test_ambiguous_stamps_read_month_first():
+    df = preprocessor.preprocess("1/2/23, 9:41 PM - Alice: hi\n")
+    assert df['date'].iloc[0] == pd.Timestamp('2023-01-02 21:41')
+
+
+def test_wrong_order_fails_loudly():
+    chat_format = preprocessor.FORMATS_BY_NAME['android_24h_mdy_yyyy']
+    text = render_chat(chat_format, pd.date_range('2020-01-01', periods=100, freq='7h'))
+    with pytest.raises(ValueError):
+        preprocessor.parse_messages(text, preprocessor.with_order(chat_format, 'dmy'))
+
+
+def test_block_without_messages_keeps_schema():
+    chat_format = preprocessor.FORMATS_BY_NAME['android_24h_dmy_yyyy']
+    empty = preprocessor.parse_messages('\n  \n', chat_format)
+    full = preprocessor.parse_messages('05/01/2023, 10:00 - Alice: hi\n', chat_format)
+
+    assert empty.empty
+    assert empty.dtypes.to_dict() == full.dtypes.to_dict()
+    assert empty.attrs['chat_format'] == chat_format.name
+
+
+@pytest.mark.parametrize('container', ['utf-8', 'utf-16', 'zip'])
+@pytest.mark.parametrize('platform', ['android', 'ios'])
+def test_parallel_parse_matches_serial(monkeypatch, upload, platform, container):
+    text = generate_chat(messages=3000, users=5, platform=platform, seed=4)
+    serial = preprocessor.preprocess(upload(text, container))
+
+    # Small blocks so that even this chat is split across the workers
+    monkeypatch.setattr(preprocessor, 'PARALLEL_MIN_CHARS', 0)
+    monkeypatch.setattr(ingest, 'CHUNK_SIZE', 16 * 1024)
+    parallel = preprocessor.preprocess(upload(text, container), workers=2)
+
+    pd.testing.assert_frame_equal(parallel, serial)
+    assert parallel.attrs == serial.attrs
+    pd.testing.assert_frame_equal(preprocessor.preprocess(text), serial)
+
+
+@pytest.mark.parametrize('message, kind', [
+    ("<Media omitted>", preprocessor.MessageKind.MEDIA),
+    ("\u200eimage omitted", preprocessor.MessageKind.MEDIA),
+    ("This message was deleted", preprocessor.MessageKind.DELETED),
+    ("Missed voice call", preprocessor.MessageKind.CALL),
+    ("\u200eMissed video call, \u200eTap to call back", preprocessor.MessageKind.CALL),
+    ("Voice call, \u200e12 min", preprocessor.MessageKind.CALL),
+    ("POLL: Lunch? OPTION: Pizza (2 votes) OPTION: Sushi (1 vote)", preprocessor.MessageKind.POLL),
+    # Ordinary messages that only mention a call or a poll
+    ("poll: who's in?", preprocessor.MessageKind.TEXT),
+    ("POLL: who's in?", preprocessor.MessageKind.TEXT),
+    ("video call tonight?", preprocessor.MessageKind.TEXT),
+    ("Video call, anyone?", preprocessor.MessageKind.TEXT),
+    ("missed voice call, sorry", preprocessor.MessageKind.TEXT),
+])
+def test_classify_messages(message, kind):
+    kinds = preprocessor.classify_messages(pd.Series(['Alice']), pd.Series([message]))
+    assert kinds[0] == kind
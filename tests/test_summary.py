@@ -0,0 +1,27 @@
+import pytest
+import helper
+import preprocessor
+import summary
+from benchmarks.generator import generate_chat
+
+
+@pytest.mark.parametrize('container', ['utf-8', 'utf-16', 'zip'])
+@pytest.mark.parametrize('platform', ['android', 'ios'])
+def test_summary_matches_chat_index(upload, assert_same_report, platform, container):
+    text = generate_chat(messages=2000, users=5, platform=platform, seed=11)
+    # Small chunks so that the summary is merged from many parts
+    folded = summary.summarize(upload(text, container), chunk_size=16 * 1024)
+    index = helper.ChatIndex(preprocessor.preprocess(upload(text, container), compact=True))
+
+    assert folded.attrs == index.df.attrs
+    for user in ['Overall'] + index.users[:2]:
+        assert_same_report(helper.analyze(index, user), helper.analyze(folded, user))
+
+
+def test_sketched_summary_nbytes_counts_sketches(upload):
+    sketched = summary.summarize(upload(generate_chat(messages=2000, users=5, seed=11)), error=0.01)
+    words = sketched.word_matrix
+
+    # The Count-Min tables alone, without the tracked words and per-user summaries
+    assert words.nbytes > words.counts.nbytes + words.user_counts.nbytes
+    assert sketched.nbytes > words.nbytes + sketched.emoji_matrix.nbytes + sketched.participant_sketch.nbytes
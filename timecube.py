@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+import cache
+from preprocessor import DAYS_ORDER, MONTHS_ORDER, factorize_users
+
+HOURS = 24
+
+
+class TimeCube:
+    """
+    Message counts by user x date x hour, built once per chat
+
+    Stored sparsely: the non-zero (user, day, hour) cells sorted by user, plus
+    dense day x hour totals for the whole chat. Every time-based chart is a
+    reduction of one user's cells, so its cost depends on how many days and
+    hours that user was active, not on the number of messages.
+    """
+
+    def __init__(self, df):
+        dates = pd.to_datetime(df['date'], errors='coerce')
+        valid = dates.notna().to_numpy()
+        days = dates.to_numpy()[valid].astype('datetime64[D]').astype(np.int64)
+        hours = dates.dt.hour.to_numpy()[valid].astype(np.int64)
+        user_codes, users = factorize_users(df['user'][valid])
+        self._build(users, user_codes, days, hours)
+
+    def _build(self, users, user_codes, days, hours, counts=None):
+        # days are absolute day numbers; counts=None means one message per entry
+        self.users = {user: code for code, user in enumerate(users)}
+        self.first_day = days.min() if len(days) else 0
+        self.num_days = int(days.max() - self.first_day + 1) if len(days) else 0
+
+        # Calendar attributes of every day in the chat's range
+        calendar = np.arange(self.first_day, self.first_day + self.num_days).astype('datetime64[D]')
+        months = calendar.astype('datetime64[M]').astype(np.int64)
+        self.calendar = calendar
+        self.weekday = (calendar.astype(np.int64) + 3) % 7    # 1970-01-01 was a Thursday
+        self.month_num = months % 12
+        self.month_id = months - (months.min() if len(months) else 0)
+        self.first_month = months.min() if len(months) else 0
+
+        # Non-zero cells, sorted by (user, day, hour)
+        cells = (user_codes.astype(np.int64) * self.num_days + (days - self.first_day)) * HOURS + hours
+        if counts is None:
+            cells, counts = np.unique(cells, return_counts=True)
+        else:
+            cells, inverse = np.unique(cells, return_inverse=True)
+            counts = np.bincount(inverse, weights=counts, minlength=len(cells)).astype(np.int64)
+        cell_users = cells // (self.num_days * HOURS) if self.num_days else cells
+        self.cell_days = (cells // HOURS) % max(self.num_days, 1)
+        self.cell_hours = cells % HOURS
+        self.cell_counts = counts
+        self.indptr = np.searchsorted(cell_users, np.arange(len(users) + 1))
+
+        # Whole-chat totals as a dense day x hour grid
+        self.totals = np.zeros((self.num_days, HOURS), dtype=np.int64)
+        np.add.at(self.totals, (self.cell_days, self.cell_hours), self.cell_counts)
+
+    @property
+    def nbytes(self):
+        """
+        Memory of the cells, calendar and totals
+        """
+        return sum(cache.nbytes(value) for value in self.__dict__.values())
+
+    def merge(self, other):
+        """
+        Cube of both chats' messages; counts are summed, so nothing is recounted
+        """
+        users = list(self.users) + [user for user in other.users if user not in self.users]
+        codes = {user: code for code, user in enumerate(users)}
+        parts = []
+        for cube in (self, other):
+            mapping = np.array([codes[user] for user in cube.users], dtype=np.int64)
+            cell_users = np.repeat(mapping, np.diff(cube.indptr))
+            parts.append((cell_users, cube.cell_days + cube.first_day, cube.cell_hours, cube.cell_counts))
+
+        merged = TimeCube.__new__(TimeCube)
+        merged._build(users, *(np.concatenate(columns) for columns in zip(*parts)))
+        return merged
+
+    def cells(self, users=None):
+        """
+        (day, hour, count) arrays for the given users (None = whole chat)
+        """
+        if users is None:
+            days, hours = np.nonzero(self.totals)
+            return days, hours, self.totals[days, hours]
+        parts = []
+        for user in users:
+            code = self.users.get(user)
+            if code is not None:
+                parts.append(slice(self.indptr[code], self.indptr[code + 1]))
+        if not parts:
+            empty = np.array([], dtype=np.int64)
+            return empty, empty, empty
+        select = np.concatenate([np.arange(part.start, part.stop) for part in parts])
+        return self.cell_days[select], self.cell_hours[select], self.cell_counts[select]
+
+    def daily(self, users=None):
+        """
+        Messages per calendar day
+        """
+        if users is None:
+            return self.totals.sum(axis=1)
+        days, _, counts = self.cells(users)
+        return np.bincount(days, weights=counts, minlength=self.num_days).astype(np.int64)
+
+    def monthly(self, users=None):
+        """
+        Messages per month, indexed from the chat's first month
+        """
+        daily = self.daily(users)
+        return np.bincount(self.month_id, weights=daily,
+                           minlength=self.month_id.max() + 1 if self.num_days else 0).astype(np.int64)
+
+    def weekdays(self, users=None):
+        """
+        Messages per weekday, Monday first
+        """
+        return np.bincount(self.weekday, weights=self.daily(users), minlength=7).astype(np.int64)
+
+    def months_of_year(self, users=None):
+        """
+        Messages per calendar month, January first
+        """
+        return np.bincount(self.month_num, weights=self.daily(users), minlength=12).astype(np.int64)
+
+    def week_hours(self, users=None):
+        """
+        Messages per weekday x hour grid
+        """
+        days, hours, counts = self.cells(users)
+        grid = np.bincount(self.weekday[days] * HOURS + hours, weights=counts, minlength=7 * HOURS)
+        return grid.astype(np.int64).reshape(7, HOURS)
+
+
+def day_index(values):
+    """
+    Ordered weekday index as produced by the original day_name categoricals
+    """
+    return pd.CategoricalIndex(values, categories=DAYS_ORDER, ordered=True, name='day_name')
+
+
+def month_index(values):
+    """
+    Ordered month index as produced by the original month categoricals
+    """
+    return pd.CategoricalIndex(values, categories=MONTHS_ORDER, ordered=True, name='month')
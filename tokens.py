@@ -0,0 +1,390 @@
+import os
+import re
+import threading
+from functools import cached_property
+from itertools import chain
+import numpy as np
+import pandas as pd
+import cache
+import emojis
+import profiling
+from preprocessor import MessageKind, factorize_users, message_kinds
+
+STOP_WORDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stop_hinglish.txt')
+
+# Used when stop_hinglish.txt is missing
+DEFAULT_STOP_WORDS = {'the', 'and', 'to', 'of', 'i', 'a', 'you', 'is', 'that', 'it',
+                      'in', 'my', 'for', 'me', 'on', 'this', 'with', 'but', 'have',
+                      'are', 'was', 'be', 'so', 'just', 'like', 'not', 'at', 'hi',
+                      'hello', 'hey', 'ok', 'okay', 'yes', 'no', 'hmm', 'lol'}
+
+URL_RE = re.compile(r'http\S+')
+
+# Cheap test every URL passes; URLExtract needs a dot before a (possibly non-ASCII) TLD
+URL_CANDIDATE_RE = re.compile(r'\.[^\W\d_]|://|www\.', re.IGNORECASE)
+PUNCTUATION_RE = re.compile(r'[^\w\s]')
+
+# Host part of a URL, without scheme, credentials or a leading 'www.'
+DOMAIN_RE = re.compile(r'^(?:[a-zA-Z][\w+.-]*://)?(?:[^@/]*@)?(?:www\.)?([^/:?#]+)', re.IGNORECASE)
+
+
+# Process-wide singletons, created on first use
+_stop_words = None
+_extractor = None
+_lock = threading.Lock()
+
+
+def load_stop_words():
+    """
+    Stop words shared by the word cloud and common-words analysis
+    """
+    global _stop_words
+    if _stop_words is None:
+        with _lock:
+            if _stop_words is None:
+                try:
+                    with open(STOP_WORDS_FILE, 'r', encoding='utf-8') as f:
+                        _stop_words = set(f.read().split())
+                except FileNotFoundError:
+                    _stop_words = set(DEFAULT_STOP_WORDS)
+    return _stop_words
+
+
+def url_extractor():
+    """
+    URLExtract shared by the whole process; importing it and loading its TLD list is slow
+    """
+    global _extractor
+    if _extractor is None:
+        with _lock:
+            if _extractor is None:
+                from urlextract import URLExtract
+                _extractor = URLExtract()
+    return _extractor
+
+
+def _offsets(counts):
+    """
+    Start offsets of each message's items in a flat array, plus the end
+    """
+    return np.concatenate([[0], np.cumsum(counts, dtype=np.int64)])
+
+
+def gather(values, offsets, rows):
+    """
+    Items of the given message rows from a flat array, in message order
+    """
+    if rows is None:
+        return values
+    starts = offsets[rows]
+    lengths = offsets[rows + 1] - starts
+    segment_starts = np.cumsum(lengths) - lengths
+    return values[np.repeat(starts - segment_starts, lengths) + np.arange(lengths.sum())]
+
+
+class WordMatrix:
+    """
+    Sparse user x vocabulary word counts (CSR layout) built once per chat
+
+    Top words for any user or set of users is a row sum plus a partial sort.
+    Within each user's row, words are kept in order of first use so ties
+    rank the same way Counter.most_common would.
+    """
+
+    def __init__(self, tokens, token_users, users):
+        # Vocabulary in order of first use across the chat
+        token_codes, vocabulary = pd.factorize(pd.Series(tokens, dtype=object))
+        self._build(users, np.asarray(vocabulary, dtype=object), token_users, token_codes)
+
+    def _build(self, users, vocabulary, pair_users, pair_words, pair_counts=None):
+        # pair_counts=None means each (user, word) entry is one use
+        self.users = list(users)
+        self._user_codes = {user: code for code, user in enumerate(self.users)}
+        self.vocabulary = vocabulary
+        width = max(len(self.vocabulary), 1)
+        self.totals = np.bincount(pair_words, weights=pair_counts,
+                                  minlength=len(self.vocabulary)).astype(np.int64)
+
+        # Distinct (user, word) pairs in order of first use, then grouped by user
+        pair_codes, pairs = pd.factorize(pair_users.astype(np.int64) * width + pair_words)
+        pairs = np.asarray(pairs)
+        counts = np.bincount(pair_codes, weights=pair_counts, minlength=len(pairs)).astype(np.int64)
+        pair_users = pairs // width
+        order = np.argsort(pair_users, kind='stable')
+
+        self.indices = (pairs % width)[order]
+        self.data = counts[order]
+        self.indptr = _offsets(np.bincount(pair_users, minlength=len(self.users)))
+
+    @property
+    def nbytes(self):
+        """
+        Memory of the vocabulary and counts
+        """
+        return sum(cache.nbytes(value) for value in self.__dict__.values())
+
+    def merge(self, other):
+        """
+        Counts of both chats, as if other's messages followed this chat's
+
+        Existing (user, word) pairs keep their position, so tie-breaking by
+        first use is unchanged.
+        """
+        users = self.users + [user for user in other.users if user not in self._user_codes]
+        codes = {user: code for code, user in enumerate(users)}
+        word_codes, vocabulary = pd.factorize(np.concatenate([self.vocabulary, other.vocabulary]))
+        other_words = word_codes[len(self.vocabulary):]
+        other_users = np.array([codes[user] for user in other.users], dtype=np.int64)
+
+        merged = WordMatrix.__new__(WordMatrix)
+        merged._build(
+            users, np.asarray(vocabulary, dtype=object),
+            np.concatenate([np.repeat(np.arange(len(self.users)), np.diff(self.indptr)),
+                            np.repeat(other_users, np.diff(other.indptr))]),
+            np.concatenate([self.indices, other_words[other.indices]]),
+            np.concatenate([self.data, other.data]))
+        return merged
+
+    def _row(self, user):
+        code = self._user_codes.get(user)
+        if code is None:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+        start, end = self.indptr[code], self.indptr[code + 1]
+        return self.indices[start:end], self.data[start:end]
+
+    def counts(self, users=None):
+        """
+        Dense word counts summed over users (None = whole chat)
+        """
+        if users is None:
+            return self.totals
+        summed = np.zeros(len(self.vocabulary), dtype=np.int64)
+        for user in users:
+            words, counts = self._row(user)
+            summed[words] += counts
+        return summed
+
+    def used(self, users=None):
+        """
+        (word codes, counts) of the words users used, in order of first use
+        """
+        if users is not None and len(users) == 1:
+            # A single row is already in first-use order
+            return self._row(users[0])
+        counts = self.counts(users)
+        words = np.flatnonzero(counts)
+        return words, counts[words]
+
+    def top(self, n, users=None):
+        """
+        The n most used (word, count) pairs for users (None = whole chat)
+        """
+        words, counts = self.used(users)
+
+        if len(counts) > n:
+            # Partial sort: only words reaching the n-th largest count can make the cut
+            threshold = np.partition(counts, len(counts) - n)[len(counts) - n]
+            candidates = np.flatnonzero(counts >= threshold)
+        else:
+            candidates = np.arange(len(counts))
+        candidates = candidates[np.argsort(-counts[candidates], kind='stable')][:n]
+
+        return [(self.vocabulary[word], int(count))
+                for word, count in zip(words[candidates], counts[candidates])]
+
+
+class TokenStore:
+    """
+    Tokenization of a chat computed once and shared by all text analytics
+
+    Each component is built on first use. Per-message items (cleaned tokens,
+    emojis) are kept as one flat array plus offsets, so the items of any set
+    of rows can be gathered without re-tokenizing.
+    """
+
+    def __init__(self, df):
+        self.users = df['user']
+        self.kinds = message_kinds(df)
+        messages = df['message'].astype(object).to_numpy()
+        # One message per line of the joined text
+        self.messages = [message.replace('\n', ' ') for message in messages]
+        self.size = len(self.messages)
+
+    @property
+    def nbytes(self):
+        """
+        Memory of the messages and of every component built so far
+
+        users is the DataFrame's own column, so it is left to the DataFrame.
+        """
+        return sum(cache.nbytes(value) for name, value in self.__dict__.items() if name != 'users')
+
+    def extend(self, df, other):
+        """
+        Store for df, whose rows are this store's messages followed by other's
+
+        Components already built here are merged with other's instead of
+        re-tokenizing the whole chat; the rest stay lazy.
+        """
+        store = TokenStore.__new__(TokenStore)
+        store.users = df['user']
+        store.kinds = np.concatenate([self.kinds, other.kinds])
+        store.messages = self.messages + other.messages
+        store.size = len(store.messages)
+
+        for name in ('word_counts', 'url_candidates'):
+            if name in self.__dict__:
+                store.__dict__[name] = np.concatenate([getattr(self, name), getattr(other, name)])
+        for name in ('_cleaned', '_emojis', '_urls'):
+            if name in self.__dict__:
+                (values, offsets), (more, more_offsets) = getattr(self, name), getattr(other, name)
+                store.__dict__[name] = (np.concatenate([values, more]),
+                                        np.concatenate([offsets, more_offsets[1:] + offsets[-1]]))
+        if 'word_matrix' in self.__dict__:
+            store.__dict__['word_matrix'] = self.word_matrix.merge(other.word_matrix)
+        return store
+
+    @cached_property
+    def word_counts(self):
+        """
+        Whitespace-separated words per message
+        """
+        return np.fromiter((len(message.split()) for message in self.messages),
+                           dtype=np.int32, count=self.size)
+
+    @cached_property
+    @profiling.timed('tokens.clean', rows=lambda result, store: store.size)
+    def _cleaned(self):
+        # URLs, emoji and punctuation are stripped from the whole chat in three passes;
+        # the joined text is not kept, so the store holds one copy of the messages
+        text = URL_RE.sub('', '\n'.join(self.messages))
+        text = emojis.strip_emojis(text)
+        text = PUNCTUATION_RE.sub('', text).lower()
+        words = [line.split() for line in text.split('\n')]
+
+        counts = np.fromiter(map(len, words), dtype=np.int64, count=self.size)
+        flat = pd.Series(list(chain.from_iterable(words)), dtype=object)
+        keep = ((flat.str.len() > 2) & ~flat.isin(load_stop_words())).to_numpy()
+
+        rows = np.repeat(np.arange(self.size), counts)
+        kept_counts = np.bincount(rows[keep], minlength=self.size)
+        return flat.to_numpy()[keep], _offsets(kept_counts)
+
+    @property
+    def tokens(self):
+        """
+        Cleaned, stop-word filtered tokens of every message, flattened
+        """
+        return self._cleaned[0]
+
+    @property
+    def token_offsets(self):
+        return self._cleaned[1]
+
+    @cached_property
+    @profiling.timed('tokens.emojis', rows=lambda result, store: store.size)
+    def _emojis(self):
+        # Whole emoji sequences with their offsets in the joined chat text
+        matches = list(emojis.iter_emojis('\n'.join(self.messages)))
+        positions = np.fromiter((start for start, _ in matches), dtype=np.int64, count=len(matches))
+        values = np.array([char for _, char in matches], dtype=object)
+
+        lengths = np.fromiter(map(len, self.messages), dtype=np.int64, count=self.size)
+        line_starts = _offsets(lengths + 1)[:-1]
+        rows = np.searchsorted(line_starts, positions, side='right') - 1
+        return values, _offsets(np.bincount(rows, minlength=self.size))
+
+    @property
+    def emojis(self):
+        """
+        Emoji sequences of every message, flattened
+        """
+        return self._emojis[0]
+
+    @property
+    def emoji_offsets(self):
+        return self._emojis[1]
+
+    @cached_property
+    def url_candidates(self):
+        """
+        Messages that could contain a URL: a dot before a letter, '://' or 'www.'
+        """
+        return pd.Series(self.messages, dtype=object).str.contains(
+            URL_CANDIDATE_RE, na=False).to_numpy()
+
+    @cached_property
+    @profiling.timed('tokens.urls', rows=lambda result, store: store.size)
+    def _urls(self):
+        # The full extractor only runs on the few candidate messages
+        rows = np.flatnonzero(self.url_candidates)
+        extract = url_extractor() if len(rows) else None
+        found = [extract.find_urls(self.messages[row]) for row in rows]
+
+        counts = np.zeros(self.size, dtype=np.int64)
+        counts[rows] = [len(urls) for urls in found]
+        return np.array(list(chain.from_iterable(found)), dtype=object), _offsets(counts)
+
+    @property
+    def urls(self):
+        """
+        URLs of every message, flattened
+        """
+        return self._urls[0]
+
+    @property
+    def url_offsets(self):
+        return self._urls[1]
+
+    @cached_property
+    def url_counts(self):
+        """
+        URLs found in each message
+        """
+        return np.diff(self.url_offsets).astype(np.int32)
+
+    @property
+    def media(self):
+        """
+        Messages counted as shared media
+        """
+        return self.kinds == MessageKind.MEDIA
+
+    @property
+    def wordable(self):
+        """
+        Messages included in word analysis: plain text only
+        """
+        return self.kinds == MessageKind.TEXT
+
+    @cached_property
+    @profiling.timed('tokens.word_matrix', rows=lambda result, store: store.size)
+    def word_matrix(self):
+        """
+        User x vocabulary counts over the messages included in word analysis
+        """
+        rows = np.flatnonzero(self.wordable)
+        tokens = self.tokens_for(rows)
+        offsets = self.token_offsets
+        user_codes, users = factorize_users(self.users)
+        token_users = np.repeat(user_codes[rows], offsets[rows + 1] - offsets[rows])
+        return WordMatrix(tokens, token_users, users)
+
+    def select(self, rows, mask=None):
+        """
+        Row positions restricted to mask; rows=None means every message
+        """
+        if mask is None:
+            return rows
+        if rows is None:
+            return np.flatnonzero(mask)
+        return rows[mask[rows]]
+
+    def tokens_for(self, rows):
+        return gather(self.tokens, self.token_offsets, rows)
+
+    def emojis_for(self, rows):
+        return gather(self.emojis, self.emoji_offsets, rows)
+
+    def urls_for(self, rows):
+        return gather(self.urls, self.url_offsets, rows)